@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 
 # to import modules as non-relative
 sys.path.append(os.path.dirname(__file__))
@@ -11,7 +12,8 @@ def classFactory(iface):  # pylint: disable=invalid-name
     :param iface: A QGIS interface instance.
     :type iface: QgsInterface
     """
-    #
+    # measure cost of loading the plugin on QGIS startup
+    started_at = time.perf_counter()
     from .gtfs_go import GTFSGo
 
-    return GTFSGo(iface)
+    return GTFSGo(iface, started_at)
@@ -0,0 +1,238 @@
+"""
+Time each stage of the pipeline with a synthetic feed, run from the plugin directory:
+
+    python -m benchmarks.run_benchmarks --size medium --output bench.json
+    python -m benchmarks.run_benchmarks --size medium --compare bench.json
+
+Wall time and peak RSS of the process after each stage are recorded.
+Peak RSS never decreases, so a stage raising it is the one using most memory.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Tweeked to import gtfs_parser for Python 3.11
+try:
+    from gtfs_parser import gtfs_parser
+except ImportError:
+    # Python 3.9 or 3.10
+    import gtfs_parser
+
+from gtfs_go_aggregate import AggregatorCache
+from gtfs_go_feed import feather, load_gtfs
+from gtfs_go_writer import write_csv, write_geojson
+
+from .synthetic_feed import write_synthetic_feed
+
+# resource is not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SIZES = {
+    "small": {"stops": 200, "routes": 10, "trips_per_route": 20},
+    "medium": {"stops": 5000, "routes": 200, "trips_per_route": 100},
+    "large": {"stops": 30000, "routes": 1000, "trips_per_route": 200},
+}
+
+
+def get_max_rss_mb():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    if sys.platform == "darwin":
+        return max_rss / 1024**2
+    return max_rss / 1024
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    def measure(self, name: str, func, *args, **kwargs):
+        started_at = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.stages[name] = {
+            "seconds": round(time.perf_counter() - started_at, 4),
+            "max_rss_mb": get_max_rss_mb(),
+        }
+        return result
+
+
+def load_layers(timer: StageTimer, paths: dict):
+    """
+    Time loading written files as QGIS layers, skipped without QGIS.
+    """
+    try:
+        from qgis.core import QgsApplication, QgsVectorLayer
+    except ImportError:
+        return
+
+    app = QgsApplication([], False)
+    app.initQgis()
+    for name, path in paths.items():
+        timer.measure(
+            f"load_{name}",
+            lambda p=path, n=name: QgsVectorLayer(p, n, "ogr").featureCount(),
+        )
+    app.exitQgis()
+
+
+def load_feed(feed_path: str, snapshot_dir: str):
+    """
+    Load the feed as the plugin does, including stop_times which is read on first access.
+    """
+    gtfs = load_gtfs(feed_path, snapshot_dir, compact=True)
+    gtfs.stop_times
+    return gtfs
+
+
+def run_benchmark(feed_params: dict, work_dir: str) -> dict:
+    # generated in another process not to raise peak RSS of this process
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        feed_path = executor.submit(
+            write_synthetic_feed, os.path.join(work_dir, "feed.zip"), **feed_params
+        ).result()
+
+    timer = StageTimer()
+    timer.stages["start"] = {"seconds": 0.0, "max_rss_mb": get_max_rss_mb()}
+
+    # gtfs_parser without GTFS-GO, as a baseline of loading
+    baseline_gtfs = timer.measure(
+        "gtfs_factory_baseline", gtfs_parser.GTFSFactory, feed_path
+    )
+    del baseline_gtfs
+
+    snapshot_dir = os.path.join(work_dir, "snapshots")
+    gtfs = timer.measure("load_gtfs_cold", load_feed, feed_path, snapshot_dir)
+    if feather is not None:
+        # memory-mapped from the snapshot written by the cold load
+        del gtfs
+        gtfs = timer.measure("load_gtfs_warm", load_feed, feed_path, snapshot_dir)
+    routes = timer.measure("read_routes", gtfs_parser.parse.read_routes, gtfs)
+    stops = timer.measure("read_stops", gtfs_parser.parse.read_stops, gtfs)
+    # as the plugin aggregates, with steps replaced in gtfs_go_aggregate
+    aggregator = timer.measure(
+        "aggregator",
+        AggregatorCache(max_feeds=1).get_aggregator,
+        "benchmark",
+        gtfs,
+        yyyymmdd="20240102",
+    )
+    route_frequency = timer.measure(
+        "read_route_frequency", aggregator.read_route_frequency
+    )
+    interpolated_stops = timer.measure(
+        "read_interpolated_stops", aggregator.read_interpolated_stops
+    )
+    stop_relations = timer.measure(
+        "read_stop_relations", aggregator.read_stop_relations
+    )
+
+    paths = {
+        "routes": os.path.join(work_dir, "routes.geojson"),
+        "stops": os.path.join(work_dir, "stops.geojson"),
+        "aggregated_routes": os.path.join(work_dir, "aggregated_routes.geojson"),
+        "aggregated_stops": os.path.join(work_dir, "aggregated_stops.geojson"),
+    }
+    timer.measure("write_routes", write_geojson, paths["routes"], routes)
+    timer.measure("write_stops", write_geojson, paths["stops"], stops)
+    timer.measure(
+        "write_aggregated_routes",
+        write_geojson,
+        paths["aggregated_routes"],
+        route_frequency,
+    )
+    timer.measure(
+        "write_aggregated_stops",
+        write_geojson,
+        paths["aggregated_stops"],
+        interpolated_stops,
+    )
+    timer.measure(
+        "write_result_csv",
+        write_csv,
+        os.path.join(work_dir, "result.csv"),
+        stop_relations,
+    )
+    load_layers(timer, paths)
+
+    return timer.stages
+
+
+def compare(stages: dict, baseline: dict):
+    print(f"{'stage':<28}{'baseline':>10}{'current':>10}{'ratio':>8}")
+    for name, stage in stages.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["seconds"]
+        after = stage["seconds"]
+        ratio = after / before if before > 0 else float("nan")
+        print(f"{name:<28}{before:>10.3f}{after:>10.3f}{ratio:>8.2f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--size", choices=SIZES.keys(), default="small")
+    parser.add_argument("--stops", type=int)
+    parser.add_argument("--routes", type=int)
+    parser.add_argument("--trips-per-route", type=int)
+    parser.add_argument("--stops-per-trip", type=int, default=20)
+    parser.add_argument("--no-shapes", action="store_true")
+    parser.add_argument("--calendar-dates", type=int, default=20)
+    parser.add_argument("--output", help="JSON file to write results")
+    parser.add_argument("--compare", help="JSON file of results to compare with")
+    args = parser.parse_args(argv)
+
+    feed_params = dict(SIZES[args.size])
+    for name in ("stops", "routes", "trips_per_route"):
+        if getattr(args, name) is not None:
+            feed_params[name] = getattr(args, name)
+    feed_params["stops_per_trip"] = args.stops_per_trip
+    feed_params["shapes"] = not args.no_shapes
+    feed_params["calendar_dates"] = args.calendar_dates
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        stages = run_benchmark(feed_params, work_dir)
+
+    result = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "feed": feed_params,
+        "stages": stages,
+    }
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(stages, json.load(f)["stages"])
+    else:
+        print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, mode="w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
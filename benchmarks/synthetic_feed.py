@@ -0,0 +1,188 @@
+"""
+Synthetic GTFS feeds of configurable size for benchmarks, generated offline.
+"""
+
+import csv
+import io
+import random
+import zipfile
+
+# a grid of stops around Tokyo
+ORIGIN_LAT = 35.6
+ORIGIN_LON = 139.6
+STOP_SPACING_DEGREE = 0.002
+
+START_DATE = "20240101"
+END_DATE = "20241231"
+SERVICE_IDS = ("WEEKDAY", "SATURDAY", "HOLIDAY")
+
+
+def _write_table(z: zipfile.ZipFile, filename: str, header: list, rows):
+    with io.StringIO() as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(header)
+        writer.writerows(rows)
+        z.writestr(filename, f.getvalue())
+
+
+def _format_time(seconds: int) -> str:
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def write_synthetic_feed(
+    path: str,
+    stops=1000,
+    routes=50,
+    trips_per_route=100,
+    stops_per_trip=20,
+    shapes=True,
+    calendar_dates=20,
+    seed=0,
+) -> str:
+    """
+    Write a GTFS zip file. Stops are on a grid, and each route visits a random
+    sequence of neighbouring stops. Stops are paired by name, so that unifying
+    has similar stops to merge.
+
+    Args:
+        path (str): path to zip file
+        stops (int): number of stops
+        routes (int): number of routes
+        trips_per_route (int): trips of each route, spread from 5:00 to 25:00
+        stops_per_trip (int): stops visited by a trip
+        shapes (bool): write shapes.txt
+        calendar_dates (int): number of exceptions in calendar_dates.txt
+        seed (int): seed of random, same arguments write the same feed
+
+    Returns:
+        str: path
+    """
+    rnd = random.Random(seed)
+    width = max(1, int(stops**0.5))
+    stop_coords = [
+        (
+            round(ORIGIN_LAT + (i // width) * STOP_SPACING_DEGREE, 6),
+            round(ORIGIN_LON + (i % width) * STOP_SPACING_DEGREE, 6),
+        )
+        for i in range(stops)
+    ]
+
+    # each route walks over neighbouring stops on the grid
+    route_patterns = []
+    for _ in range(routes):
+        current = rnd.randrange(stops)
+        pattern = [current]
+        while len(pattern) < min(stops_per_trip, stops):
+            candidates = [
+                c
+                for c in (current - 1, current + 1, current - width, current + width)
+                if 0 <= c < stops and c not in pattern
+            ]
+            if not candidates:
+                break
+            current = rnd.choice(candidates)
+            pattern.append(current)
+        route_patterns.append(pattern)
+
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        _write_table(
+            z,
+            "agency.txt",
+            ["agency_id", "agency_name", "agency_url", "agency_timezone"],
+            [["A1", "Synthetic Bus", "https://example.com", "Asia/Tokyo"]],
+        )
+        _write_table(
+            z,
+            "stops.txt",
+            ["stop_id", "stop_name", "stop_lat", "stop_lon"],
+            [
+                [f"S{i}", f"Stop {i // 2}", lat, lon]
+                for i, (lat, lon) in enumerate(stop_coords)
+            ],
+        )
+        _write_table(
+            z,
+            "routes.txt",
+            [
+                "route_id",
+                "agency_id",
+                "route_short_name",
+                "route_long_name",
+                "route_type",
+            ],
+            [[f"R{r}", "A1", str(r), f"Route {r}", 3] for r in range(routes)],
+        )
+        _write_table(
+            z,
+            "calendar.txt",
+            [
+                "service_id",
+                "monday",
+                "tuesday",
+                "wednesday",
+                "thursday",
+                "friday",
+                "saturday",
+                "sunday",
+                "start_date",
+                "end_date",
+            ],
+            [
+                ["WEEKDAY", 1, 1, 1, 1, 1, 0, 0, START_DATE, END_DATE],
+                ["SATURDAY", 0, 0, 0, 0, 0, 1, 0, START_DATE, END_DATE],
+                ["HOLIDAY", 0, 0, 0, 0, 0, 0, 1, START_DATE, END_DATE],
+            ],
+        )
+        _write_table(
+            z,
+            "calendar_dates.txt",
+            ["service_id", "date", "exception_type"],
+            [
+                [
+                    rnd.choice(SERVICE_IDS),
+                    f"2024{rnd.randint(1, 12):02d}{rnd.randint(1, 28):02d}",
+                    rnd.choice((1, 2)),
+                ]
+                for _ in range(calendar_dates)
+            ],
+        )
+
+        trips = []
+        stop_times = []
+        for r, pattern in enumerate(route_patterns):
+            for t in range(trips_per_route):
+                trip_id = f"T{r}_{t}"
+                trips.append(
+                    [
+                        f"R{r}",
+                        SERVICE_IDS[t % len(SERVICE_IDS)],
+                        trip_id,
+                        f"SH{r}" if shapes else "",
+                    ]
+                )
+                departure = 5 * 3600 + t * (20 * 3600 // max(1, trips_per_route))
+                for seq, stop_idx in enumerate(pattern):
+                    time = _format_time(departure + seq * 120)
+                    stop_times.append([trip_id, time, time, f"S{stop_idx}", seq + 1])
+        _write_table(
+            z, "trips.txt", ["route_id", "service_id", "trip_id", "shape_id"], trips
+        )
+        _write_table(
+            z,
+            "stop_times.txt",
+            ["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
+            stop_times,
+        )
+
+        if shapes:
+            _write_table(
+                z,
+                "shapes.txt",
+                ["shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence"],
+                [
+                    [f"SH{r}", *stop_coords[stop_idx], seq + 1]
+                    for r, pattern in enumerate(route_patterns)
+                    for seq, stop_idx in enumerate(pattern)
+                ],
+            )
+    return path
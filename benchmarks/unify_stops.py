@@ -0,0 +1,68 @@
+"""
+Time unifying stops by name and distance, run from the plugin directory:
+
+    python -m benchmarks.unify_stops --stops 50000 --names 2000
+
+Stops share a limited number of names, as "駅前" is shared in real feeds.
+Comparing all stops of same name needs memory quadratic to stops per name,
+so --names should not be too small with --upstream.
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from gtfs_go_aggregate import MAX_DISTANCE_DEGREE, Aggregator, calc_near_id_pair
+
+# stops spread over about 50 km square
+AREA_DEGREE = 0.5
+
+
+def make_stops(stops: int, names: int, seed=0) -> pd.DataFrame:
+    rnd = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "stop_id": [f"S{i}" for i in range(stops)],
+            "stop_name": [f"Stop {i}" for i in rnd.integers(0, names, stops)],
+            "stop_lon": 139.5 + rnd.random(stops) * AREA_DEGREE,
+            "stop_lat": 35.5 + rnd.random(stops) * AREA_DEGREE,
+        }
+    )
+
+
+def measure(func, *args):
+    started_at = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started_at
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--stops", type=int, default=50000)
+    parser.add_argument("--names", type=int, default=2000)
+    parser.add_argument(
+        "--upstream", action="store_true", help="also time Aggregator of gtfs_parser"
+    )
+    args = parser.parse_args(argv)
+
+    stops = make_stops(args.stops, args.names)
+    grid_pairs, grid_seconds = measure(calc_near_id_pair, stops, MAX_DISTANCE_DEGREE)
+    print(f"grid: {grid_seconds:.3f} s")
+
+    if args.upstream:
+        upstream_pairs, upstream_seconds = measure(
+            Aggregator._Aggregator__calc_near_id_pair, stops, MAX_DISTANCE_DEGREE
+        )
+        print(f"upstream: {upstream_seconds:.3f} s")
+        print(f"speed-up: {upstream_seconds / grid_seconds:.1f}x")
+        pd.testing.assert_frame_equal(
+            upstream_pairs.reset_index(drop=True), grid_pairs, check_dtype=False
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
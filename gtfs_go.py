@@ -1,26 +1,55 @@
 import os
+import threading
+import time
 
-from qgis.PyQt.QtCore import QCoreApplication, QSettings, QTranslator
+from qgis.core import Qgis, QgsMessageLog
+from qgis.PyQt.QtCore import QCoreApplication, QSettings, QTimer, QTranslator
 from qgis.PyQt.QtGui import QIcon
 from qgis.PyQt.QtWidgets import QAction
 
-# Import the code for the DockWidget
-from gtfs_go_dialog import GTFSGoDialog
+from gtfs_go_settings import PREWARM_DELAY_MS
+
+# GTFSGoDialog is imported in run(), not to load pandas, gtfs_parser and requests
+# while QGIS is starting up
+
+
+def log_elapsed(message: str, started_at: float):
+    QgsMessageLog.logMessage(
+        f"{message}: {(time.perf_counter() - started_at) * 1000:.1f} ms",
+        "GTFS-GO",
+        Qgis.MessageLevel.Info,
+    )
+
+
+def prewarm():
+    """
+    Import heavy modules in background, after QGIS has started.
+    They are imported on the first run() if it is not finished yet.
+    """
+    started_at = time.perf_counter()
+    import gtfs_go_pipeline  # noqa: F401
+
+    log_elapsed("heavy modules imported in background", started_at)
 
 
 class GTFSGo:
     """QGIS Plugin Implementation."""
 
-    def __init__(self, iface):
+    def __init__(self, iface, started_at=None):
         """Constructor.
 
         :param iface: An interface instance that will be passed to this class
             which provides the hook by which you can manipulate the QGIS
             application at run time.
         :type iface: QgsInterface
+
+        :param started_at: time.perf_counter() when loading the plugin started,
+            to log startup time.
+        :type started_at: float
         """
         # Save reference to the QGIS interface
         self.iface = iface
+        self.started_at = started_at or time.perf_counter()
 
         # initialize plugin directory
         self.plugin_dir = os.path.dirname(__file__)
@@ -146,6 +175,13 @@ class GTFSGo:
             add_to_plugin_toolbar=True,
         )
 
+        log_elapsed("plugin loaded", self.started_at)
+        # pre-warm on idle, after other plugins have been loaded
+        QTimer.singleShot(
+            PREWARM_DELAY_MS,
+            lambda: threading.Thread(target=prewarm, daemon=True).start(),
+        )
+
     # --------------------------------------------------------------------------
 
     def onClosePlugin(self):
@@ -178,5 +214,9 @@ class GTFSGo:
     def run(self):
         """Run method that loads and starts the plugin"""
         if self.dialog is None:
+            started_at = time.perf_counter()
+            from gtfs_go_dialog import GTFSGoDialog
+
             self.dialog = GTFSGoDialog(self.iface)
+            log_elapsed("dialog opened", started_at)
         self.dialog.show()
@@ -0,0 +1,458 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+
+# Tweeked to import gtfs_parser for Python 3.11
+try:
+    from gtfs_parser import gtfs_parser
+except ImportError:
+    # Python 3.9 or 3.10
+    import gtfs_parser
+
+from gtfs_go_calendar import ServiceCalendar
+from gtfs_go_feed import hhmmss_to_seconds, time_to_seconds
+
+Aggregator = gtfs_parser.aggregate.Aggregator
+
+# same as default of Aggregator
+MAX_DISTANCE_DEGREE = 0.003
+
+# grid cells are a little larger than the distance,
+# so that rounding never puts near stops two cells apart
+GRID_CELL_MARGIN = 1.001
+
+# private steps of Aggregator reused to build it from cached results
+IS_MEMOIZABLE = all(
+    hasattr(Aggregator, "_Aggregator__" + step)
+    for step in (
+        "get_similar_stop_without_unifying",
+        "unify_child_stops",
+    )
+)
+
+# entries of each intermediate result kept per feed
+MAX_ENTRIES_PER_FEED = 8
+
+# rows of results converted to features at once
+RECORDS_CHUNK_SIZE = 10000
+
+
+def calc_near_id_pair(solo_stops: pd.DataFrame, max_distance_degree: float):
+    """
+    Same as Aggregator.__calc_near_id_pair without comparing all stops of same name.
+    Stops are hashed to a grid of max_distance_degree, and only stops of
+    same name in neighbouring cells are compared. Each stop points to the
+    smallest stop_id near to it, and pointers are followed to the root.
+
+    Returns:
+        pd.DataFrame: stop_id and similar_stop_id, sorted by stop_id
+    """
+    # codes of ids sorted as strings, smaller code is smaller stop_id
+    id_codes, stop_ids = pd.factorize(solo_stops["stop_id"], sort=True)
+    # NaN names are -1, they are near to each other as merging names does
+    name_codes = pd.factorize(solo_stops["stop_name"])[0]
+    lon = solo_stops["stop_lon"].to_numpy(dtype=float)
+    lat = solo_stops["stop_lat"].to_numpy(dtype=float)
+
+    cell_size = max_distance_degree * GRID_CELL_MARGIN
+    cells = pd.DataFrame(
+        {
+            "name": name_codes,
+            # stops without coordinates are in a cell but near to nothing
+            "x": np.floor(np.nan_to_num(lon) / cell_size).astype(np.int64),
+            "y": np.floor(np.nan_to_num(lat) / cell_size).astype(np.int64),
+            "stop": np.arange(len(solo_stops)),
+        }
+    )
+    neighbours = pd.concat(
+        [
+            cells.assign(x=cells["x"] + dx, y=cells["y"] + dy)
+            for dx in (-1, 0, 1)
+            for dy in (-1, 0, 1)
+        ]
+    )
+    pairs = cells.merge(neighbours, on=["name", "x", "y"], suffixes=("", "_r"))
+    left = pairs["stop"].to_numpy()
+    right = pairs["stop_r"].to_numpy()
+    is_near = (lon[left] - lon[right]) ** 2 + (
+        lat[left] - lat[right]
+    ) ** 2 <= max_distance_degree**2
+
+    # the smallest stop id among the near stops, len(stop_ids) if none
+    root = np.full(len(stop_ids), len(stop_ids))
+    np.minimum.at(root, id_codes[left[is_near]], id_codes[right[is_near]])
+    has_root = np.flatnonzero(root < len(stop_ids))
+
+    # join near groups, a root is always smaller than stops pointing to it
+    roots = root[has_root]
+    while True:
+        next_roots = root[roots]
+        if np.array_equal(next_roots, roots):
+            break
+        roots = next_roots
+
+    return pd.DataFrame(
+        {
+            "stop_id": stop_ids[has_root].to_numpy(dtype=object),
+            "similar_stop_id": stop_ids[roots].to_numpy(dtype=object),
+        }
+    )
+
+
+def unify_solo_stops(solo_stops, delimiter: str, max_distance_degree: float):
+    """
+    Same as Aggregator.__unify_solo_stops, using calc_near_id_pair().
+    """
+    delimited_id_pair = []
+    if delimiter:
+        # unify by delimiter
+        stop_id_delimited = (
+            solo_stops["stop_id"].str.split(delimiter).str[0].rename("similar_stop_id")
+        )
+        delimited_id_pair = pd.concat(
+            [solo_stops["stop_id"], stop_id_delimited], axis=1
+        )[solo_stops["stop_id"] != stop_id_delimited]
+    if len(delimited_id_pair) == len(solo_stops):
+        solo_id_pair = delimited_id_pair
+    else:
+        # unify by distance
+        if len(delimited_id_pair) > 0:
+            undelimited_stops = solo_stops[
+                ~solo_stops["stop_id"].isin(delimited_id_pair["stop_id"])
+            ]
+        else:
+            undelimited_stops = solo_stops
+        near_id_pair = calc_near_id_pair(undelimited_stops, max_distance_degree)
+
+        if len(delimited_id_pair) == 0:
+            solo_id_pair = near_id_pair
+        else:
+            solo_id_pair = pd.concat([delimited_id_pair, near_id_pair])
+
+    if len(solo_id_pair) == 0:
+        return None, None
+
+    # calc similar stop attributes
+    solo_stops_with_similar = pd.merge(solo_stops, solo_id_pair, on="stop_id")
+    solo_similar_stops = (
+        solo_stops_with_similar.groupby("similar_stop_id")
+        .agg({"stop_name": "min", "stop_lon": "mean", "stop_lat": "mean"})
+        .reset_index()
+    )
+    solo_similar_stops.rename(columns={"stop_name": "similar_stop_name"}, inplace=True)
+    solo_similar_stops["similar_stops_centroid"] = solo_similar_stops[
+        ["stop_lon", "stop_lat"]
+    ].values.tolist()
+    solo_similar_stops.drop(columns=["stop_lon", "stop_lat"], inplace=True)
+    return solo_similar_stops, solo_id_pair
+
+
+def unify_similar_stops(stops, delimiter: str, max_distance_degree: float):
+    """
+    Same as Aggregator.__unify_similar_stops, using unify_solo_stops().
+    """
+    child_similar_stop = None
+    child_id_pair = None
+
+    # unify by parent_station
+    if "location_type" in stops.columns:
+        child_similar_stop, child_id_pair = Aggregator._Aggregator__unify_child_stops(
+            stops
+        )
+        solo_stops = stops[
+            ~stops["stop_id"].isin(child_id_pair["stop_id"])
+            & (stops["location_type"] == 0)
+        ]
+    else:
+        solo_stops = stops
+
+    solo_similar_stops, solo_id_pair = unify_solo_stops(
+        solo_stops, delimiter, max_distance_degree
+    )
+    return pd.concat([child_similar_stop, solo_similar_stops]), pd.concat(
+        [child_id_pair, solo_id_pair]
+    )
+
+
+def count_path_frequency(stop_times, stop_relations, trips, routes):
+    """
+    Count trips passing each path between similar stops, as
+    Aggregator.read_route_frequency() does with merging and shifting DataFrames.
+    Ids are encoded to integer codes sorted as strings, consecutive stops of
+    each trip are paired on arrays, and pairs packed to int64 are counted.
+
+    Returns:
+        Optional[pd.DataFrame]: agency_id, prev_stop_id, next_stop_id and frequency
+            sorted by them as groupby() does. None if ids are not unique.
+    """
+    relation_index = pd.Index(stop_relations["stop_id"])
+    trip_agency = pd.merge(
+        trips[["trip_id", "route_id"]],
+        routes[["route_id", "agency_id"]],
+        on="route_id",
+    )
+    trip_index = pd.Index(trip_agency["trip_id"])
+    if not relation_index.is_unique or not trip_index.is_unique:
+        # merging duplicates rows, not to be counted here
+        return None
+
+    similar_codes, similar_stop_ids = pd.factorize(
+        stop_relations["similar_stop_id"], sort=True
+    )
+    agency_codes, agency_ids = pd.factorize(trip_agency["agency_id"], sort=True)
+
+    # -1 for stops and trips dropped by inner merges, and for NaN agency_id
+    stop_positions = relation_index.get_indexer(stop_times["stop_id"])
+    trip_positions = trip_index.get_indexer(stop_times["trip_id"])
+    stop_codes = np.where(stop_positions >= 0, similar_codes[stop_positions], -1)
+    stop_agency_codes = np.where(trip_positions >= 0, agency_codes[trip_positions], -1)
+    is_valid = (stop_codes >= 0) & (stop_agency_codes >= 0)
+
+    trip_codes = trip_positions[is_valid]
+    stop_codes = stop_codes[is_valid]
+    stop_agency_codes = stop_agency_codes[is_valid]
+    order = np.lexsort((stop_times["stop_sequence"].to_numpy()[is_valid], trip_codes))
+    trip_codes = trip_codes[order]
+    stop_codes = stop_codes[order]
+    stop_agency_codes = stop_agency_codes[order]
+
+    # pairs of a stop and the next stop of the same trip
+    is_path = trip_codes[:-1] == trip_codes[1:]
+    n_stops = np.int64(len(similar_stop_ids))
+    keys = (
+        stop_agency_codes[:-1][is_path].astype(np.int64) * n_stops
+        + stop_codes[:-1][is_path]
+    ) * n_stops + stop_codes[1:][is_path]
+    keys, frequency = np.unique(keys, return_counts=True)
+
+    return pd.DataFrame(
+        {
+            "agency_id": agency_ids[keys // (n_stops * n_stops)],
+            "prev_stop_id": similar_stop_ids[keys // n_stops % n_stops],
+            "next_stop_id": similar_stop_ids[keys % n_stops],
+            "frequency": frequency.astype(np.int64),
+        }
+    )
+
+
+def read_route_frequency(aggregator: Aggregator) -> Iterator[dict]:
+    """
+    Same as Aggregator.read_route_frequency(), counting with count_path_frequency().
+    Paths are counted on call, and features are made from them as they are consumed.
+
+    Returns:
+        Iterator[dict]: GeoJSON-Feature-dicts
+    """
+    path_freq_df = count_path_frequency(
+        aggregator.stop_times,
+        aggregator.stop_relations,
+        aggregator.gtfs.trips,
+        aggregator.gtfs.routes,
+    )
+    if path_freq_df is None:
+        return iter(Aggregator.read_route_frequency(aggregator))
+
+    # append path attributes
+    for order in ["prev", "next"]:
+        path_freq_df = pd.merge(
+            path_freq_df,
+            aggregator.similar_stops,
+            left_on=f"{order}_stop_id",
+            right_on="similar_stop_id",
+        )
+        path_freq_df.rename(
+            columns={
+                "similar_stop_name": f"{order}_stop_name",
+                "similar_stops_centroid": f"{order}_similar_stops_centroid",
+            },
+            inplace=True,
+        )
+        path_freq_df.drop(columns="similar_stop_id", inplace=True)
+
+    path_freq_df = pd.merge(
+        path_freq_df,
+        aggregator.gtfs.agency[["agency_id", "agency_name"]],
+        on="agency_id",
+    )
+    return iter_path_features(path_freq_df)
+
+
+def iter_path_features(path_freq_df: pd.DataFrame) -> Iterator[dict]:
+    # rows are converted to dicts by chunks, not all at once
+    for start in range(0, len(path_freq_df), RECORDS_CHUNK_SIZE):
+        chunk = path_freq_df.iloc[start : start + RECORDS_CHUNK_SIZE]
+        for path in chunk.to_dict(orient="records"):
+            yield {
+                "type": "Feature",
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": (
+                        path["prev_similar_stops_centroid"],
+                        path["next_similar_stops_centroid"],
+                    ),
+                },
+                "properties": {
+                    "frequency": path["frequency"],
+                    "prev_stop_id": path["prev_stop_id"],
+                    "prev_stop_name": path["prev_stop_name"],
+                    "next_stop_id": path["next_stop_id"],
+                    "next_stop_name": path["next_stop_name"],
+                    "agency_id": path["agency_id"],
+                    "agency_name": path["agency_name"],
+                },
+            }
+
+
+class MemoizedAggregator(Aggregator):
+    """
+    Aggregator built from cached intermediate results, see AggregatorCache.
+    Results of read_* methods are made on each call, not to keep them all in memory.
+    """
+
+    def __init__(self, gtfs, stop_times, similar_stops, stop_relations):
+        # Aggregator.__init__() is not called, its attributes are set from cache
+        self.gtfs = gtfs
+        self.stop_times = stop_times
+        self.similar_stops = similar_stops
+        self.stop_relations = stop_relations
+
+    def read_route_frequency(self):
+        return read_route_frequency(self)
+
+
+class AggregatorCache:
+    """
+    Session-level cache of intermediate results of Aggregator.
+    Each result is keyed by exactly the parameters it depends on:
+
+    - unified stops: no_unify_stops, delimiter
+    - trips on service date: yyyymmdd
+    - stop_times filtered by date and time: yyyymmdd, begin_time, end_time
+
+    So changing time window only redoes filtering stop_times and counting frequency,
+    unifying stops is skipped. Results of read_* methods are not cached, they are
+    as large as the output and cheap to make from the intermediate results.
+    Each feed has a lock, so that workers aggregating the same feed compute
+    each result only once.
+
+    Args:
+        max_feeds (int): number of feeds to keep, least recently used one is dropped.
+    """
+
+    def __init__(self, max_feeds: int):
+        self.max_feeds = max_feeds
+        self.feeds = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _get_feed_cache(self, feed_key: str) -> dict:
+        with self.lock:
+            if feed_key not in self.feeds:
+                self.feeds[feed_key] = {
+                    "gtfs": None,
+                    "service_calendar": None,
+                    "unified_stops": OrderedDict(),
+                    "trips_on_date": OrderedDict(),
+                    "stop_times": OrderedDict(),
+                    "lock": threading.Lock(),
+                }
+                while len(self.feeds) > self.max_feeds:
+                    self.feeds.popitem(last=False)
+            self.feeds.move_to_end(feed_key)
+            return self.feeds[feed_key]
+
+    @staticmethod
+    def _cached(cache: OrderedDict, key, compute: Callable):
+        # called with the lock of the feed
+        if key not in cache:
+            cache[key] = compute()
+            while len(cache) > MAX_ENTRIES_PER_FEED:
+                cache.popitem(last=False)
+        cache.move_to_end(key)
+        return cache[key]
+
+    def get_gtfs(self, feed_key: str, load: Callable):
+        """
+        Args:
+            feed_key (str): key to identify the feed, such as SHA-256 of zip file.
+            load (Callable): returns gtfs_parser.GTFS, called when it is not cached.
+        """
+        feed_cache = self._get_feed_cache(feed_key)
+        with feed_cache["lock"]:
+            if feed_cache["gtfs"] is None:
+                feed_cache["gtfs"] = load()
+            return feed_cache["gtfs"]
+
+    def get_aggregator(
+        self,
+        feed_key: str,
+        gtfs,
+        no_unify_stops=False,
+        delimiter="",
+        yyyymmdd="",
+        begin_time="",
+        end_time="",
+    ) -> Aggregator:
+        """
+        Returns an Aggregator equivalent to
+        Aggregator(gtfs, no_unify_stops, delimiter, yyyymmdd=yyyymmdd, begin_time=begin_time, end_time=end_time)
+        """
+        if not IS_MEMOIZABLE:
+            return Aggregator(
+                gtfs,
+                no_unify_stops=no_unify_stops,
+                delimiter=delimiter,
+                yyyymmdd=yyyymmdd,
+                begin_time=begin_time,
+                end_time=end_time,
+            )
+
+        feed_cache = self._get_feed_cache(feed_key)
+        with feed_cache["lock"]:
+            similar_stops, stop_relations = self._cached(
+                feed_cache["unified_stops"],
+                (no_unify_stops, delimiter),
+                lambda: self._unify_stops(gtfs, no_unify_stops, delimiter),
+            )
+            stop_times = self._cached(
+                feed_cache["stop_times"],
+                (yyyymmdd, begin_time, end_time),
+                lambda: self._filter_stop_times(
+                    feed_cache, gtfs, yyyymmdd, begin_time, end_time
+                ),
+            )
+        return MemoizedAggregator(gtfs, stop_times, similar_stops, stop_relations)
+
+    @staticmethod
+    def _unify_stops(gtfs, no_unify_stops: bool, delimiter: str):
+        if no_unify_stops:
+            return Aggregator._Aggregator__get_similar_stop_without_unifying(gtfs.stops)
+        return unify_similar_stops(gtfs.stops, delimiter, MAX_DISTANCE_DEGREE)
+
+    def _filter_stop_times(
+        self, feed_cache: dict, gtfs, yyyymmdd: str, begin_time: str, end_time: str
+    ):
+        stop_times = gtfs.stop_times
+        if yyyymmdd:
+            if feed_cache["service_calendar"] is None:
+                # built once per feed, to aggregate many dates
+                feed_cache["service_calendar"] = ServiceCalendar.from_gtfs(gtfs)
+            trip_ids = self._cached(
+                feed_cache["trips_on_date"],
+                yyyymmdd,
+                lambda: feed_cache["service_calendar"].get_trips_on(
+                    gtfs.trips, yyyymmdd
+                ),
+            )
+            stop_times = stop_times[stop_times["trip_id"].isin(trip_ids)]
+        if begin_time and end_time:
+            # same as comparing hhmmss as integers by Aggregator, missing times are -1
+            seconds = time_to_seconds(stop_times["departure_time"])
+            stop_times = stop_times[
+                (seconds >= hhmmss_to_seconds(begin_time))
+                & (seconds < hhmmss_to_seconds(end_time))
+            ]
+        # only columns used to aggregate are kept in cache
+        return stop_times[["trip_id", "stop_sequence", "stop_id"]]
@@ -0,0 +1,236 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+WEEKDAYS = (
+    "monday",
+    "tuesday",
+    "wednesday",
+    "thursday",
+    "friday",
+    "saturday",
+    "sunday",
+)
+
+# days of bitmap after the last start_date or exception, so that open-ended
+# calendars, such as ending 29991231, don't make the bitmap centuries long
+MAX_DAYS_AFTER_CHANGES = 366
+
+
+def _to_ordinal(yyyymmdd: str) -> int:
+    # datetime.date is valid until year 9999, unlike nanoseconds of pd.Timestamp
+    try:
+        return datetime.datetime.strptime(yyyymmdd, "%Y%m%d").date().toordinal()
+    except ValueError:
+        return -1
+
+
+def _to_ordinals(dates: pd.Series) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: ordinals of datetime.date, -1 for missing and invalid dates
+    """
+    # each distinct date is parsed once
+    codes, uniques = pd.factorize(dates)
+    ordinals = np.array(
+        [_to_ordinal(str(date)) for date in uniques] + [-1], dtype=np.int64
+    )
+    # code of missing date is -1, the last one
+    return ordinals[codes]
+
+
+def _get_weekdays(days: np.ndarray) -> np.ndarray:
+    # ordinal 1 is monday, 0001-01-01
+    return (days - 1) % 7
+
+
+class ServiceCalendar:
+    """
+    Dates on which each service runs, resolved from calendar.txt and
+    calendar_dates.txt once per feed, as Aggregator does for a date.
+    A row of bitmap is a service and a column is a day from first_day,
+    so both services on a date and dates of a service are an array lookup.
+    Days after the bitmap have neither exceptions nor start_date, so services
+    on them are resolved from rows of calendar.txt by weekday and end_date.
+
+    Args:
+        service_ids (np.ndarray): service_id of each row of bitmap
+        first_day (int): ordinal of datetime.date of the first column
+        bitmap (np.ndarray): bool array of services x days
+        calendar_rows (np.ndarray): row of bitmap of each row of calendar.txt
+        calendar_ends (np.ndarray): ordinal of end_date of each row of calendar.txt
+        calendar_weekdays (np.ndarray): bool array of rows of calendar.txt x WEEKDAYS
+    """
+
+    def __init__(
+        self,
+        service_ids: np.ndarray,
+        first_day: int,
+        bitmap: np.ndarray,
+        calendar_rows: np.ndarray,
+        calendar_ends: np.ndarray,
+        calendar_weekdays: np.ndarray,
+    ):
+        self.service_ids = service_ids
+        self.first_day = first_day
+        self.bitmap = bitmap
+        self.calendar_rows = calendar_rows
+        self.calendar_ends = calendar_ends
+        self.calendar_weekdays = calendar_weekdays
+        self.service_index = {
+            service_id: idx for idx, service_id in enumerate(service_ids)
+        }
+
+    @classmethod
+    def from_gtfs(cls, gtfs) -> "ServiceCalendar":
+        calendar = gtfs.calendar
+        calendar_dates = gtfs.calendar_dates
+        service_ids = pd.unique(
+            pd.concat(
+                [
+                    table["service_id"].astype(object)
+                    for table in (calendar, calendar_dates)
+                    if table is not None
+                ]
+                or [pd.Series(dtype=object)]
+            )
+        )
+        service_index = pd.Index(service_ids)
+
+        # rows with invalid dates never match a date
+        if calendar is not None:
+            starts = _to_ordinals(calendar["start_date"])
+            ends = _to_ordinals(calendar["end_date"])
+            is_valid = (starts >= 0) & (ends >= 0)
+            calendar_rows = service_index.get_indexer(
+                calendar["service_id"].astype(object)
+            )[is_valid]
+            calendar_weekdays = (calendar[list(WEEKDAYS)] == "1").to_numpy()[is_valid]
+            starts = starts[is_valid]
+            ends = ends[is_valid]
+        else:
+            calendar_rows = np.zeros(0, dtype=np.intp)
+            calendar_weekdays = np.zeros((0, len(WEEKDAYS)), dtype=bool)
+            starts = np.zeros(0, dtype=np.int64)
+            ends = np.zeros(0, dtype=np.int64)
+
+        if calendar_dates is not None:
+            exception_days = _to_ordinals(calendar_dates["date"])
+            is_valid = exception_days >= 0
+            exception_rows = service_index.get_indexer(
+                calendar_dates["service_id"].astype(object)
+            )[is_valid]
+            exception_types = (
+                calendar_dates["exception_type"].astype(object).to_numpy()[is_valid]
+            )
+            exception_days = exception_days[is_valid]
+        else:
+            exception_rows = np.zeros(0, dtype=np.intp)
+            exception_types = np.zeros(0, dtype=object)
+            exception_days = np.zeros(0, dtype=np.int64)
+
+        changes = np.concatenate([starts, exception_days])
+        if len(changes) == 0:
+            return cls(
+                service_ids,
+                0,
+                np.zeros((len(service_ids), 0), dtype=bool),
+                calendar_rows,
+                ends,
+                calendar_weekdays,
+            )
+
+        first_day = int(changes.min())
+        last_change = int(changes.max())
+        last_day = last_change
+        if len(ends) > 0:
+            last_day = max(
+                last_change, min(int(ends.max()), last_change + MAX_DAYS_AFTER_CHANGES)
+            )
+        days = np.arange(first_day, last_day + 1)
+        weekdays = _get_weekdays(days)
+        bitmap = np.zeros((len(service_ids), len(days)), dtype=bool)
+
+        for row, start, end, flags in zip(
+            calendar_rows, starts, ends, calendar_weekdays
+        ):
+            # rows of same service are merged
+            bitmap[row] |= flags[weekdays] & (days >= start) & (days <= end)
+
+        # removed before added, a service both removed and added runs
+        exception_columns = exception_days - first_day
+        is_removed = exception_types == "2"
+        bitmap[exception_rows[is_removed], exception_columns[is_removed]] = False
+        is_added = exception_types == "1"
+        bitmap[exception_rows[is_added], exception_columns[is_added]] = True
+
+        return cls(
+            service_ids, first_day, bitmap, calendar_rows, ends, calendar_weekdays
+        )
+
+    def _is_running_on(self, day: int) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: bool array of services running on the day
+        """
+        if day < max(self.first_day, 0):
+            return np.zeros(len(self.service_ids), dtype=bool)
+        column = day - self.first_day
+        if column < self.bitmap.shape[1]:
+            return self.bitmap[:, column]
+
+        # after the bitmap, only end_date of calendar rows matters
+        is_running = np.zeros(len(self.service_ids), dtype=bool)
+        is_active = self.calendar_weekdays[:, _get_weekdays(day)] & (
+            self.calendar_ends >= day
+        )
+        is_running[self.calendar_rows[is_active]] = True
+        return is_running
+
+    def get_services_on(self, yyyymmdd: str) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: service_ids running on the date
+        """
+        return self.service_ids[self._is_running_on(_to_ordinal(yyyymmdd))]
+
+    def get_dates_of(self, service_id: str) -> list:
+        """
+        Returns:
+            list: dates the service runs on, as YYYYMMDD
+        """
+        row = self.service_index.get(service_id)
+        if row is None:
+            return []
+        days = [np.flatnonzero(self.bitmap[row]) + self.first_day]
+
+        is_service = self.calendar_rows == row
+        if is_service.any():
+            # after the bitmap, until end_date of calendar rows of the service
+            after = np.arange(
+                self.first_day + self.bitmap.shape[1],
+                self.calendar_ends[is_service].max() + 1,
+            )
+            weekdays = _get_weekdays(after)
+            is_active = np.zeros(len(after), dtype=bool)
+            for flags, end in zip(
+                self.calendar_weekdays[is_service], self.calendar_ends[is_service]
+            ):
+                is_active |= flags[weekdays] & (after <= end)
+            days.append(after[is_active])
+
+        return [
+            datetime.date.fromordinal(int(day)).strftime("%Y%m%d")
+            for day in np.concatenate(days)
+        ]
+
+    def get_trips_on(self, trips: pd.DataFrame, yyyymmdd: str) -> pd.Series:
+        """
+        Same as Aggregator.__get_trips_on_a_date()
+
+        Returns:
+            pd.Series: trip_id of trips running on the date
+        """
+        services = self.get_services_on(yyyymmdd)
+        return trips[trips["service_id"].isin(services)]["trip_id"]
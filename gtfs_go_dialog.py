@@ -1,14 +1,10 @@
-import csv
 import datetime
 import json
 import os
-import shutil
-import tempfile
-import uuid
 from typing import Optional
 
-import requests
 from qgis.core import (
+    QgsApplication,
     QgsCoordinateReferenceSystem,
     QgsProject,
     QgsSymbolLayer,
@@ -16,27 +12,42 @@ from qgis.core import (
 )
 from qgis.gui import QgisInterface
 from qgis.PyQt import uic
-from qgis.PyQt.QtCore import QDate, QSortFilterProxyModel, Qt
+from qgis.PyQt.QtCore import QDate, Qt
 from qgis.PyQt.QtWidgets import QAbstractItemView, QDialog, QLineEdit, QMessageBox
 
 import constants
-import gtfs_parser
 import repository
+from gtfs_go_aggregate import AggregatorCache
+from gtfs_go_download import DownloadCache
 from gtfs_go_labeling import get_labeling_for_stops
+from gtfs_go_memory import MemoryLayerSource
+from gtfs_go_palette import RouteColorPalette
 from gtfs_go_renderer import Renderer
-from gtfs_go_settings import STOPS_MINIMUM_VISIBLE_SCALE
-
-# Tweeked to import gtfs_parser for Python 3.11
-try:
-    from gtfs_parser import gtfs_parser
-except ImportError:
-    # Python 3.9 or 3.10
-    import gtfs_parser
-
+from gtfs_go_settings import (
+    DOWNLOAD_CACHE_DIR,
+    DOWNLOAD_CACHE_MAX_AGE,
+    DOWNLOAD_CACHE_MAX_SIZE,
+    JAPAN_DPF_CACHE_DIR,
+    JAPAN_DPF_CACHE_TTL,
+    JAPAN_DPF_CATALOGUE_PATH,
+    ROUTE_COLORS_PATH,
+    SESSION_CACHE_MAX_FEEDS,
+    STOPS_MINIMUM_VISIBLE_SCALE,
+    VECTOR_TILE_MAX_ZOOM,
+    VECTOR_TILE_MIN_ZOOM,
+)
+from gtfs_go_task import MEMORY_FORMAT, GTFSGoTask
+from gtfs_go_trace import TRACE_FILENAME, StageTrace
+from gtfs_go_writer import (
+    OUTPUT_FORMATS,
+    VECTOR_TILE_FORMATS,
+    get_available_formats,
+)
+from repository.japan_dpf.api import FeedsClient, ResponseCache
+from repository.japan_dpf.catalogue import Catalogue
 from repository.japan_dpf.table import HEADERS, HEADERS_TO_HIDE
 
 DATALIST_JSON_PATH = os.path.join(os.path.dirname(__file__), "gtfs_go_datalist.json")
-TEMP_DIR = os.path.join(tempfile.gettempdir(), "GTFSGo")
 
 REPOSITORY_ENUM = {"preset": 0, "japanDpf": 1}
 
@@ -52,6 +63,12 @@ class GTFSGoDialog(QDialog):
             self.datalist = json.load(f)
         self.iface = iface
         self.combobox_zip_text = self.tr("---Load local ZipFile---")
+        self.task = None
+        self.download_cache = DownloadCache(
+            DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MAX_SIZE, DOWNLOAD_CACHE_MAX_AGE
+        )
+        self.aggregator_cache = AggregatorCache(SESSION_CACHE_MAX_FEEDS)
+        self.route_palette = RouteColorPalette(ROUTE_COLORS_PATH)
         self.init_gui()
 
     def init_gui(self):
@@ -66,12 +83,24 @@ class GTFSGoDialog(QDialog):
         for data in self.datalist:
             self.ui.comboBox.addItem(self.make_combobox_text(data), data)
 
+        # output format combobox, layers are made in memory unless files are exported
+        self.ui.outputFormatComboBox.addItem(self.tr("Temporary layers"), MEMORY_FORMAT)
+        # formats without driver in GDAL of this QGIS are not listed
+        for output_format in get_available_formats(
+            OUTPUT_FORMATS + VECTOR_TILE_FORMATS
+        ):
+            self.ui.outputFormatComboBox.addItem(output_format, output_format)
+        self.ui.minZoomSpinBox.setValue(VECTOR_TILE_MIN_ZOOM)
+        self.ui.maxZoomSpinBox.setValue(VECTOR_TILE_MAX_ZOOM)
+
         self.init_local_repository_gui()
         self.init_japan_dpf_gui()
 
         # set refresh event on some ui
         self.ui.repositoryCombobox.currentIndexChanged.connect(self.refresh)
         self.ui.outputDirFileWidget.fileChanged.connect(self.refresh)
+        self.ui.outputFormatComboBox.currentIndexChanged.connect(self.refresh)
+        self.ui.traceCheckBox.stateChanged.connect(self.refresh)
         self.ui.unifyCheckBox.stateChanged.connect(self.refresh)
         self.ui.timeFilterCheckBox.stateChanged.connect(self.refresh)
         self.ui.simpleCheckbox.clicked.connect(self.refresh)
@@ -124,6 +153,28 @@ class GTFSGoDialog(QDialog):
         )
 
         self.japanDpfSearchButton.clicked.connect(self.japan_dpf_search)
+        self.japanDpfFilterLineEdit.textChanged.connect(
+            lambda text: self.japanDpfResultTableView.model().set_filter_text(text)
+        )
+
+        self.japan_dpf_client = FeedsClient(
+            ResponseCache(JAPAN_DPF_CACHE_DIR, JAPAN_DPF_CACHE_TTL), self
+        )
+        self.japan_dpf_client.pageReceived.connect(self.japan_dpf_append_table)
+        self.japan_dpf_client.finished.connect(self.japan_dpf_search_finished)
+        self.japan_dpf_client.failed.connect(self.japan_dpf_search_failed)
+        self.japan_dpf_client.catalogueReceived.connect(self.japan_dpf_sync_finished)
+        self.japan_dpf_client.catalogueFailed.connect(self.japan_dpf_sync_failed)
+        self.japan_dpf_client.catalogueCanceled.connect(self.japan_dpf_sync_canceled)
+
+        self.japan_dpf_catalogue = Catalogue(JAPAN_DPF_CATALOGUE_PATH)
+        self.japanDpfSyncButton.clicked.connect(self.japan_dpf_sync)
+        # results of previous parameters are no longer wanted, syncing goes on
+        self.ui.japanDpfTargetDateEdit.dateChanged.connect(self.japan_dpf_cancel)
+        self.japanDpfPrefectureCombobox.currentIndexChanged.connect(
+            self.japan_dpf_cancel
+        )
+        self.japanDpfExtentGroupBox.extentChanged.connect(self.japan_dpf_cancel)
 
     def make_combobox_text(self, data):
         """
@@ -143,21 +194,6 @@ class GTFSGoDialog(QDialog):
         """
         return "[" + data["country"] + "]" + "[" + data["region"] + "]" + data["name"]
 
-    def download_zip(self, url: str) -> Optional[str]:
-        response = requests.get(url)
-        if response.status_code != 200:
-            self.iface.messageBar().pushCritical(
-                self.tr("Error"),
-                self.tr("Failed to download GTFS data from the URL: ") + url,
-            )
-            return None
-        data = response.content
-        download_path = os.path.join(TEMP_DIR, str(uuid.uuid4()) + ".zip")
-        with open(download_path, mode="wb") as f:
-            f.write(data)
-
-        return download_path
-
     def get_target_feed_infos(self):
         feed_infos = []
         if self.repositoryCombobox.currentData() == REPOSITORY_ENUM["preset"]:
@@ -197,124 +233,89 @@ class GTFSGoDialog(QDialog):
                         + row_data["feed_id"]
                         + "-"
                         + row_data["file_uid"],
+                        # cached file is reused until the feed file is updated
+                        "cache_key": f"{row_data['file_uid']}-{row_data['file_last_updated_at']}",
                     }
                 )
         return feed_infos
 
     def execution(self):
-        if os.path.exists(TEMP_DIR):
-            shutil.rmtree(TEMP_DIR)
-        os.makedirs(TEMP_DIR, exist_ok=True)
-
-        for feed_info in self.get_target_feed_infos():
-            if feed_info["path"].startswith("http"):
-                feed_info["path"] = self.download_zip(feed_info["path"])
-                if feed_info["path"] is None:
-                    continue
-
-            output_dir = os.path.join(
-                self.outputDirFileWidget.filePath(), feed_info["dir"]
+        # read options in the main thread, widgets must not be touched in the task
+        options = {
+            "simple": self.ui.simpleCheckbox.isChecked(),
+            "ignore_shapes": self.ui.ignoreShapesCheckbox.isChecked(),
+            "ignore_no_route": self.ui.ignoreNoRouteStopsCheckbox.isChecked(),
+            "aggregate": self.ui.aggregateCheckbox.isChecked(),
+            "no_unify_stops": not self.ui.unifyCheckBox.isChecked(),
+            "delimiter": self.get_delimiter(),
+            "yyyymmdd": self.get_yyyymmdd(),
+            "begin_time": self.get_time_filter(self.ui.beginTimeLineEdit),
+            "end_time": self.get_time_filter(self.ui.endTimeLineEdit),
+            "output_format": self.ui.outputFormatComboBox.currentData(),
+            "min_zoom": min(
+                self.ui.minZoomSpinBox.value(), self.ui.maxZoomSpinBox.value()
+            ),
+            "max_zoom": max(
+                self.ui.minZoomSpinBox.value(), self.ui.maxZoomSpinBox.value()
+            ),
+            "trace": self.ui.traceCheckBox.isChecked(),
+        }
+
+        # keep reference to the task not to be garbage-collected
+        self.task = GTFSGoTask(
+            self.get_target_feed_infos(),
+            self.outputDirFileWidget.filePath(),
+            self.download_cache,
+            self.aggregator_cache,
+            options,
+        )
+        self.task.taskCompleted.connect(self.on_task_finished)
+        self.task.taskTerminated.connect(self.on_task_finished)
+
+        self.ui.pushButton.setEnabled(False)
+        self.ui.pushButton.setText(self.tr("Processing..."))
+        QgsApplication.taskManager().addTask(self.task)
+
+    def on_task_finished(self):
+        task = self.task
+        self.task = None
+        self.ui.pushButton.setText(self.tr("Extract on QGIS"))
+        self.refresh()
+
+        for error in task.errors:
+            self.iface.messageBar().pushCritical(self.tr("Error"), error)
+
+        if task.isCanceled():
+            self.iface.messageBar().pushWarning(
+                self.tr("Canceled"), self.tr("processing is canceled")
             )
-            os.makedirs(output_dir, exist_ok=True)
-
-            written_files = {
-                "routes": "",
-                "stops": "",
-                "aggregated_routes": "",
-                "aggregated_stops": "",
-                "aggregated_csv": "",
-            }
-
-            gtfs = gtfs_parser.GTFSFactory(feed_info["path"])
-
-            if self.ui.simpleCheckbox.isChecked():
-                routes_geojson = {
-                    "type": "FeatureCollection",
-                    "features": gtfs_parser.parse.read_routes(
-                        gtfs, ignore_shapes=self.ui.ignoreShapesCheckbox.isChecked()
-                    ),
-                }
-                stops_geojson = {
-                    "type": "FeatureCollection",
-                    "features": gtfs_parser.parse.read_stops(
-                        gtfs,
-                        ignore_no_route=self.ui.ignoreNoRouteStopsCheckbox.isChecked(),
-                    ),
-                }
-                # write
-                written_files["routes"] = os.path.join(output_dir, "routes.geojson")
-                written_files["stops"] = os.path.join(output_dir, "stops.geojson")
-                with open(
-                    written_files["routes"],
-                    mode="w",
-                    encoding="utf-8",
-                ) as f:
-                    json.dump(routes_geojson, f, ensure_ascii=False)
-
-                with open(
-                    written_files["stops"],
-                    mode="w",
-                    encoding="utf-8",
-                ) as f:
-                    json.dump(stops_geojson, f, ensure_ascii=False)
-
-            if self.ui.aggregateCheckbox.isChecked():
-                aggregator = gtfs_parser.aggregate.Aggregator(
-                    gtfs,
-                    no_unify_stops=not self.ui.unifyCheckBox.isChecked(),
-                    delimiter=self.get_delimiter(),
-                    yyyymmdd=self.get_yyyymmdd(),
-                    begin_time=self.get_time_filter(self.ui.beginTimeLineEdit),
-                    end_time=self.get_time_filter(self.ui.endTimeLineEdit),
-                )
-                aggregated_routes_geojson = {
-                    "type": "FeatureCollection",
-                    "features": aggregator.read_route_frequency(),
-                }
-                aggregated_stops_geojson = {
-                    "type": "FeatureCollection",
-                    "features": aggregator.read_interpolated_stops(),
-                }
-                stop_relations = aggregator.read_stop_relations()
-                # write
-                written_files["aggregated_routes"] = os.path.join(
-                    output_dir, "aggregated_routes.geojson"
-                )
-                written_files["aggregated_stops"] = os.path.join(
-                    output_dir, "aggregated_stops.geojson"
-                )
-                written_files["aggregated_csv"] = os.path.join(output_dir, "result.csv")
-                with open(
-                    written_files["aggregated_stops"],
-                    mode="w",
-                    encoding="utf-8",
-                ) as f:
-                    json.dump(aggregated_stops_geojson, f, ensure_ascii=False)
-                with open(
-                    written_files["aggregated_routes"],
-                    mode="w",
-                    encoding="utf-8",
-                ) as f:
-                    json.dump(aggregated_routes_geojson, f, ensure_ascii=False)
-                with open(
-                    written_files["aggregated_csv"],
-                    mode="w",
-                    encoding="utf-8",
-                    errors="ignore",
-                    newline="",
-                ) as f:
-                    writer = csv.DictWriter(f, fieldnames=stop_relations[0].keys())
-                    writer.writeheader()
-                    writer.writerows(stop_relations)
+            return
 
+        for result in task.results:
             self.show_geojson(
-                feed_info["group"],
-                written_files["stops"],
-                written_files["routes"],
-                written_files["aggregated_stops"],
-                written_files["aggregated_routes"],
-                written_files["aggregated_csv"],
+                result["group"],
+                result["written_files"]["stops"],
+                result["written_files"]["routes"],
+                result["written_files"]["aggregated_stops"],
+                result["written_files"]["aggregated_routes"],
+                result["written_files"]["aggregated_csv"],
+                routes=result["routes"],
+                trace=task.trace,
             )
+        self.route_palette.save()
+
+        if task.options["trace"]:
+            trace_path = os.path.join(task.output_dir, TRACE_FILENAME)
+            task.trace.write_json(trace_path)
+            self.iface.messageBar().pushInfo(self.tr("Trace"), trace_path)
+
+        if len(task.results) > 0:
+            if task.options["output_format"] == MEMORY_FORMAT:
+                message = self.tr("temporary layers are added to the project")
+            else:
+                message = self.tr("generated files: ") + task.output_dir
+            self.iface.messageBar().pushInfo(self.tr("finish"), message)
+            self.ui.close()
 
     def get_yyyymmdd(self):
         if not self.ui.filterByDateCheckBox.isChecked():
@@ -337,6 +338,21 @@ class GTFSGoDialog(QDialog):
             return ""
         return line_edit.text().replace(":", "")
 
+    @staticmethod
+    def make_layer(
+        source, layer_name: str, trace: Optional[StageTrace] = None, feed_name=""
+    ) -> QgsVectorLayer:
+        """
+        Args:
+            source (str or MemoryLayerSource): data source written by the task
+            trace (StageTrace, optional): records time to load the layer
+            feed_name (str): name of the feed in trace
+        """
+        with (trace or StageTrace()).measure(feed_name, f"load {layer_name}"):
+            if isinstance(source, MemoryLayerSource):
+                return source.make_layer(layer_name)
+            return QgsVectorLayer(source, layer_name, "ogr")
+
     def show_geojson(
         self,
         group_name: str,
@@ -345,25 +361,25 @@ class GTFSGoDialog(QDialog):
         aggregated_stops_geojson: str,
         aggregated_routes_geojson: str,
         aggregated_csv: str,
+        routes: Optional[dict] = None,
+        trace: Optional[StageTrace] = None,
     ):
         root = QgsProject().instance().layerTreeRoot()
         group = root.insertGroup(0, group_name)
         group.setExpanded(True)
 
         if routes_geojson != "":
-            routes_vlayer = QgsVectorLayer(
-                routes_geojson, os.path.basename(routes_geojson).split(".")[0], "ogr"
+            routes_vlayer = self.make_layer(routes_geojson, "routes", trace, group_name)
+            routes_renderer = Renderer(
+                routes_vlayer, "route_name", routes, self.route_palette
             )
-            routes_renderer = Renderer(routes_vlayer, "route_name")
             routes_vlayer.setRenderer(routes_renderer.make_renderer())
 
             QgsProject.instance().addMapLayer(routes_vlayer, False)
             group.insertLayer(0, routes_vlayer)
 
         if stops_geojson != "":
-            stops_vlayer = QgsVectorLayer(
-                stops_geojson, os.path.basename(stops_geojson).split(".")[0], "ogr"
-            )
+            stops_vlayer = self.make_layer(stops_geojson, "stops", trace, group_name)
             # make and set labeling for stops
             stops_labeling = get_labeling_for_stops("stop_name")
             stops_vlayer.setLabelsEnabled(True)
@@ -380,10 +396,8 @@ class GTFSGoDialog(QDialog):
             group.insertLayer(0, stops_vlayer)
 
         if aggregated_routes_geojson != "":
-            aggregated_routes_vlayer = QgsVectorLayer(
-                aggregated_routes_geojson,
-                os.path.basename(aggregated_routes_geojson).split(".")[0],
-                "ogr",
+            aggregated_routes_vlayer = self.make_layer(
+                aggregated_routes_geojson, "aggregated_routes", trace, group_name
             )
             aggregated_routes_vlayer.loadNamedStyle(
                 os.path.join(os.path.dirname(__file__), "aggregated_routes.qml")
@@ -393,10 +407,8 @@ class GTFSGoDialog(QDialog):
             group.insertLayer(0, aggregated_routes_vlayer)
 
         if aggregated_stops_geojson != "":
-            aggregated_stops_vlayer = QgsVectorLayer(
-                aggregated_stops_geojson,
-                os.path.basename(aggregated_stops_geojson).split(".")[0],
-                "ogr",
+            aggregated_stops_vlayer = self.make_layer(
+                aggregated_stops_geojson, "aggregated_stops", trace, group_name
             )
             aggregated_stops_vlayer.loadNamedStyle(
                 os.path.join(os.path.dirname(__file__), "aggregated_stops.qml")
@@ -418,21 +430,14 @@ class GTFSGoDialog(QDialog):
             group.insertLayer(0, aggregated_stops_vlayer)
 
         if aggregated_csv != "":
-            aggregated_csv_vlayer = QgsVectorLayer(
-                aggregated_csv,
-                os.path.basename(aggregated_csv).split(".")[0],
-                "ogr",
+            aggregated_csv_vlayer = self.make_layer(
+                aggregated_csv, "result", trace, group_name
             )
             aggregated_csv_vlayer.setProviderEncoding("UTF-8")
 
             QgsProject.instance().addMapLayer(aggregated_csv_vlayer, False)
             group.insertLayer(0, aggregated_csv_vlayer)
 
-        self.iface.messageBar().pushInfo(
-            self.tr("finish"), self.tr("generated geojson files: ")
-        )
-        self.ui.close()
-
     def refresh(self):
         self.localDataSelectAreaWidget.setVisible(
             self.repositoryCombobox.currentData() == REPOSITORY_ENUM["preset"]
@@ -449,10 +454,23 @@ class GTFSGoDialog(QDialog):
             self.ui.comboBox.currentText() == self.combobox_zip_text
         )
 
+        # output directory is needed only to export files or trace
+        needs_output_dir = (
+            self.ui.outputFormatComboBox.currentData() != MEMORY_FORMAT
+            or self.ui.traceCheckBox.isChecked()
+        )
+        self.ui.outputDirFileWidget.setEnabled(needs_output_dir)
+        is_vector_tile = (
+            self.ui.outputFormatComboBox.currentData() in VECTOR_TILE_FORMATS
+        )
+        self.ui.minZoomSpinBox.setEnabled(is_vector_tile)
+        self.ui.maxZoomSpinBox.setEnabled(is_vector_tile)
+
         # set executable
         self.ui.pushButton.setEnabled(
-            (len(self.get_target_feed_infos()) > 0)
-            and (self.ui.outputDirFileWidget.filePath() != "")
+            self.task is None
+            and (len(self.get_target_feed_infos()) > 0)
+            and (not needs_output_dir or self.ui.outputDirFileWidget.filePath() != "")
             and (
                 self.ui.simpleCheckbox.isChecked()
                 or self.ui.aggregateCheckbox.isChecked()
@@ -497,12 +515,16 @@ class GTFSGoDialog(QDialog):
         mm = str(target_date.month()).zfill(2)
         dd = str(target_date.day()).zfill(2)
 
+        output_extent = self.japanDpfExtentGroupBox.outputExtent()
         extent = (
             None
-            if self.japanDpfExtentGroupBox.outputExtent().isEmpty()
-            else self.japanDpfExtentGroupBox.outputExtent()
-            .toString()
-            .replace(" : ", ",")
+            if output_extent.isEmpty()
+            else (
+                output_extent.xMinimum(),
+                output_extent.yMinimum(),
+                output_extent.xMaximum(),
+                output_extent.yMaximum(),
+            )
         )
 
         pref_code = (
@@ -513,39 +535,93 @@ class GTFSGoDialog(QDialog):
             )
         )
 
-        try:
-            results = repository.japan_dpf.api.get_feeds(
-                f"{yyyy}-{mm}-{dd}",
-                extent=extent,
-                pref=pref_code,
-            )
-            self.japan_dpf_set_table(results)
-        except Exception as e:
-            QMessageBox.information(
-                self,
-                self.tr("Error"),
-                self.tr(
-                    "Error occured, please check:\n- Internet connection.\n- Repository-server"
+        # searched offline in the local catalogue, online by extent when the API
+        # didn't provide bounding boxes of files to the catalogue
+        if self.japan_dpf_catalogue.is_synced() and (
+            extent is None or self.japan_dpf_catalogue.has_bbox()
+        ):
+            self.japan_dpf_client.cancel()
+            self.japan_dpf_set_table(
+                self.japan_dpf_catalogue.search(
+                    f"{yyyy}-{mm}-{dd}", extent=extent, pref=pref_code
                 )
-                + "\n\n"
-                + e,
             )
-        finally:
-            self.japanDpfSearchButton.setEnabled(True)
-            self.japanDpfSearchButton.setText(self.tr("Search"))
-            self.refresh()
+            self.japan_dpf_search_finished()
+            return
+
+        # filled by pages as they are received
+        self.japan_dpf_set_table([])
+        self.japan_dpf_client.search(
+            f"{yyyy}-{mm}-{dd}",
+            extent=None if extent is None else ",".join(map(str, extent)),
+            pref=pref_code,
+        )
+
+    def japan_dpf_sync(self):
+        if self.japan_dpf_client.is_fetching_catalogue():
+            # the button cancels syncing while syncing
+            self.japan_dpf_client.cancel_catalogue()
+            return
+        self.japanDpfSyncButton.setText(self.tr("Cancel sync"))
+        self.japan_dpf_client.fetch_catalogue()
+
+    def japan_dpf_sync_finished(self, feeds: list):
+        # only files updated since last sync are written, in a transaction
+        counts = self.japan_dpf_catalogue.sync(feeds)
+        self.japan_dpf_reset_sync_button()
+        self.iface.messageBar().pushInfo(
+            self.tr("Catalogue synced"),
+            self.tr("{} added, {} updated, {} removed").format(
+                counts["added"], counts["updated"], counts["removed"]
+            ),
+        )
+
+    def japan_dpf_sync_canceled(self):
+        self.japan_dpf_reset_sync_button()
+        self.iface.messageBar().pushWarning(
+            self.tr("Catalogue sync canceled"),
+            self.tr("The catalogue is not updated"),
+        )
+
+    def japan_dpf_sync_failed(self, error: str):
+        self.japan_dpf_reset_sync_button()
+        self.iface.messageBar().pushCritical(
+            self.tr("Catalogue sync failed"),
+            self.tr("The catalogue is not updated") + ": " + error,
+        )
+
+    def japan_dpf_reset_sync_button(self):
+        self.japanDpfSyncButton.setText(self.tr("Sync catalogue"))
+
+    def japan_dpf_cancel(self):
+        self.japan_dpf_client.cancel()
+        self.japan_dpf_search_finished()
+
+    def japan_dpf_search_finished(self):
+        self.japanDpfSearchButton.setEnabled(True)
+        self.japanDpfSearchButton.setText(self.tr("Search"))
+        self.refresh()
+
+    def japan_dpf_search_failed(self, error: str):
+        self.japan_dpf_search_finished()
+        QMessageBox.information(
+            self,
+            self.tr("Error"),
+            self.tr(
+                "Error occured, please check:\n- Internet connection.\n- Repository-server"
+            )
+            + "\n\n"
+            + error,
+        )
+
+    def japan_dpf_append_table(self, results: list):
+        self.japanDpfResultTableView.model().sourceModel().append(results)
 
     def japan_dpf_set_table(self, results: list):
-        # replace pref code to pref name
-        for result in results:
-            result["feed_pref"] = constants.JAPAN_PREFS_CODE_TO_NAME[
-                result["feed_pref_id"]
-            ]
         model = repository.japan_dpf.table.Model(results)
-        proxy_model = QSortFilterProxyModel()
-        proxy_model.setDynamicSortFilter(True)
-        proxy_model.setSortCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        proxy_model = repository.japan_dpf.table.FilterProxyModel()
         proxy_model.setSourceModel(model)
+        proxy_model.set_filter_text(self.japanDpfFilterLineEdit.text())
 
         self.japanDpfResultTableView.setModel(proxy_model)
         self.japanDpfResultTableView.setCornerButtonEnabled(True)
@@ -558,7 +634,6 @@ class GTFSGoDialog(QDialog):
         self.japanDpfResultTableView.resizeColumnToContents(HEADERS.index("license"))
         self.japanDpfResultTableView.resizeColumnToContents(HEADERS.index("from_date"))
         self.japanDpfResultTableView.resizeColumnToContents(HEADERS.index("to_date"))
-        self.japanDpfResultTableView.resizeRowsToContents()
 
     def get_selected_row_data_in_japan_dpf_table(self, row: int):
         data = {}
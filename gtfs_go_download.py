@@ -0,0 +1,391 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zipfile
+from typing import Callable, Optional
+
+import requests
+
+from gtfs_go_feed import file_sha256
+
+CHUNK_SIZE = 1024 * 1024
+# seconds to wait for connection and for each chunk
+TIMEOUT = 60
+
+
+class DownloadError(Exception):
+    pass
+
+
+def get_download_path(url: str, download_dir: str) -> str:
+    """
+    Same URL is always saved to the same path,
+    so that partially downloaded file can be resumed.
+    """
+    filename = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".zip"
+    return os.path.join(download_dir, filename)
+
+
+def _read_part_info(info_path: str) -> Optional[dict]:
+    try:
+        with open(info_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _get_validator(response: requests.Response) -> Optional[str]:
+    # If-Range requires a strong validator, weak ETag never matches
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _parse_content_range(value: Optional[str]) -> tuple:
+    """
+    Returns:
+        tuple: (start, total) of "bytes start-end/total", None for unknown values
+    """
+    try:
+        unit, byte_range = value.split(" ", 1)
+        first_last, total = byte_range.split("/")
+        start = int(first_last.split("-")[0])
+    except (AttributeError, ValueError):
+        return None, None
+    if unit != "bytes":
+        return None, None
+    return start, None if total == "*" else int(total)
+
+
+def download_zip(
+    url: str,
+    download_path: str,
+    progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+    is_canceled: Optional[Callable[[], bool]] = None,
+    chunk_size=CHUNK_SIZE,
+    headers: Optional[dict] = None,
+    on_response: Optional[Callable[[requests.Response], None]] = None,
+) -> Optional[str]:
+    """
+    Download zip file by streaming fixed-size chunks straight to disk.
+    Data is written to "<download_path>.part" at first and it is resumed via
+    HTTP Range request when the partial file already exists. The validator
+    (ETag or Last-Modified) and the size of the file are saved in
+    "<download_path>.part.json" and sent as If-Range, so a file changed on
+    the server is downloaded from the beginning instead of being appended.
+
+    Args:
+        url (str): URL of zip file
+        download_path (str): path to save the zip file
+        progress_callback (Callable, optional): called with (downloaded bytes, total bytes or None).
+        is_canceled (Callable, optional): returns True to stop downloading, partial file is kept.
+        chunk_size (int, optional): size of chunks in bytes. Defaults to 1MB.
+        headers (dict, optional): extra request headers, such as conditional headers.
+            When the server responds 304 Not Modified, download_path is returned
+            without writing anything, the caller is expected to have the file.
+        on_response (Callable, optional): called with the response before reading its body.
+
+    Raises:
+        DownloadError: when server responds error or downloaded file is not a valid zip.
+
+    Returns:
+        Optional[str]: download_path, None if canceled.
+    """
+    part_path = download_path + ".part"
+    info_path = part_path + ".json"
+    downloaded = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    part_info = _read_part_info(info_path) if downloaded > 0 else None
+    if downloaded > 0 and (part_info is None or not part_info.get("validator")):
+        # not known which version of the file the partial file is
+        _remove_part(part_path)
+        downloaded = 0
+
+    request_headers = dict(headers or {})
+    if downloaded > 0:
+        request_headers["Range"] = f"bytes={downloaded}-"
+        request_headers["If-Range"] = part_info["validator"]
+
+    with requests.get(
+        url, headers=request_headers, stream=True, timeout=TIMEOUT
+    ) as response:
+        is_mismatched = False
+        if response.status_code == 206:
+            start, total = _parse_content_range(response.headers.get("Content-Range"))
+            expected = part_info or {}
+            validator = _get_validator(response)
+            # bytes of another version, when the server ignores If-Range
+            is_mismatched = (
+                start != downloaded
+                or (expected.get("total") is not None and total != expected["total"])
+                or (validator is not None and validator != expected.get("validator"))
+            )
+        if response.status_code == 416 or is_mismatched:
+            # partial file is broken or the file on server was changed
+            _remove_part(part_path)
+            return download_zip(
+                url,
+                download_path,
+                progress_callback,
+                is_canceled,
+                chunk_size,
+                headers,
+                on_response,
+            )
+        if response.status_code == 304:
+            return download_path
+        if response.status_code == 206:
+            mode = "ab"
+        elif response.status_code == 200:
+            # server ignored Range header or the file was changed,
+            # download from the beginning
+            mode = "wb"
+            downloaded = 0
+        else:
+            raise DownloadError(
+                f"Failed to download GTFS data from the URL: {url} ({response.status_code})"
+            )
+
+        if on_response is not None:
+            on_response(response)
+
+        content_length = response.headers.get("Content-Length")
+        total = downloaded + int(content_length) if content_length else None
+
+        if mode == "wb":
+            with open(info_path, mode="w", encoding="utf-8") as f:
+                json.dump({"validator": _get_validator(response), "total": total}, f)
+        with open(part_path, mode=mode) as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if is_canceled is not None and is_canceled():
+                    return None
+                f.write(chunk)
+                downloaded += len(chunk)
+                if progress_callback is not None:
+                    progress_callback(downloaded, total)
+
+    if not zipfile.is_zipfile(part_path):
+        _remove_part(part_path)
+        raise DownloadError(f"Downloaded file is not a valid zip file: {url}")
+
+    os.replace(part_path, download_path)
+    _remove_part(part_path)
+    return download_path
+
+
+def _remove_part(part_path: str):
+    for path in (part_path, part_path + ".json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class DownloadCache:
+    """
+    Persistent on-disk cache of downloaded zip files.
+    Files are stored by SHA-256 of their content, and URLs point to them.
+    Cached files are revalidated by conditional GET (ETag/Last-Modified)
+    and evicted in least-recently-used order when total size exceeds max_size.
+
+    Args:
+        cache_dir (str): directory to store files and index.json.
+        max_size (int): max total size of cached files in bytes.
+        max_age (int): seconds to trust a cached file without revalidation.
+    """
+
+    INDEX_FILENAME = "index.json"
+
+    def __init__(self, cache_dir: str, max_size: int, max_age: int):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_age = max_age
+        self.lock = threading.RLock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self) -> dict:
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILENAME)
+        if os.path.exists(index_path):
+            try:
+                with open(index_path, encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                # broken index, files are re-downloaded
+                pass
+        return {"urls": {}, "files": {}}
+
+    def _save_index(self):
+        index_path = os.path.join(self.cache_dir, self.INDEX_FILENAME)
+        with open(index_path + ".tmp", mode="w", encoding="utf-8") as f:
+            json.dump(self.index, f)
+        os.replace(index_path + ".tmp", index_path)
+
+    def _file_path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, sha256 + ".zip")
+
+    def get(self, url: str) -> Optional[dict]:
+        """
+        Returns:
+            Optional[dict]: cache entry of the URL, None if not cached.
+                {sha256, path, key, etag, last_modified, checked_at}
+        """
+        with self.lock:
+            entry = self.index["urls"].get(url)
+            if entry is None or not os.path.exists(self._file_path(entry["sha256"])):
+                return None
+            return {**entry, "path": self._file_path(entry["sha256"])}
+
+    def fetch(
+        self,
+        url: str,
+        key: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, Optional[int]], None]] = None,
+        is_canceled: Optional[Callable[[], bool]] = None,
+    ) -> Optional[str]:
+        """
+        Get local path of the URL, downloading it only when needed.
+
+        Args:
+            url (str): URL of zip file
+            key (str, optional): version of the file known by the caller,
+                such as file_uid and file_last_updated_at of Japan DPF.
+                When it matches cached one, the cached file is used without network access.
+            progress_callback, is_canceled: see download_zip()
+
+        Returns:
+            Optional[str]: path to cached zip file, None if canceled.
+        """
+        entry = self.get(url)
+        download_path = get_download_path(url, self.cache_dir)
+        headers = {}
+        if entry is not None and not os.path.exists(download_path + ".part"):
+            if key is not None and entry["key"] == key:
+                return self._touch(url)
+            if key is None and time.time() - entry["checked_at"] < self.max_age:
+                return self._touch(url)
+            # revalidate by conditional GET
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        validators = {}
+
+        def on_response(response: requests.Response):
+            validators["etag"] = response.headers.get("ETag")
+            validators["last_modified"] = response.headers.get("Last-Modified")
+
+        try:
+            result = download_zip(
+                url,
+                download_path,
+                progress_callback=progress_callback,
+                is_canceled=is_canceled,
+                headers=headers,
+                on_response=on_response,
+            )
+            if result is None:
+                return None
+            if not validators:
+                # 304 Not Modified, nothing was written to download_path
+                with self.lock:
+                    self.index["urls"][url]["checked_at"] = time.time()
+                    self.index["urls"][url]["key"] = key
+                return self._touch(url)
+            return self._store(url, key, download_path, validators)
+        finally:
+            if os.path.exists(download_path):
+                os.remove(download_path)
+
+    def _store(self, url: str, key: Optional[str], path: str, validators: dict) -> str:
+        sha256 = file_sha256(path)
+        with self.lock:
+            if not os.path.exists(self._file_path(sha256)):
+                os.replace(path, self._file_path(sha256))
+            self.index["files"][sha256] = {
+                "size": os.path.getsize(self._file_path(sha256)),
+                "last_access": time.time(),
+            }
+            self.index["urls"][url] = {
+                "sha256": sha256,
+                "key": key,
+                "etag": validators.get("etag"),
+                "last_modified": validators.get("last_modified"),
+                "checked_at": time.time(),
+            }
+            self.evict(keep=sha256)
+            self._save_index()
+            return self._file_path(sha256)
+
+    def _touch(self, url: str) -> str:
+        with self.lock:
+            sha256 = self.index["urls"][url]["sha256"]
+            self.index["files"][sha256]["last_access"] = time.time()
+            self._save_index()
+            return self._file_path(sha256)
+
+    def size(self) -> int:
+        """total size of cached files in bytes"""
+        with self.lock:
+            return sum(f["size"] for f in self.index["files"].values())
+
+    def entries(self) -> list:
+        """
+        Returns:
+            list: cache entries of all URLs, see get()
+        """
+        with self.lock:
+            entries = [
+                {"url": url, **(self.get(url) or {})} for url in self.index["urls"]
+            ]
+            return [entry for entry in entries if "path" in entry]
+
+    def evict(self, keep: Optional[str] = None):
+        """
+        Remove least recently used files until total size is under max_size.
+
+        Args:
+            keep (str, optional): sha256 of a file not to be removed.
+        """
+        with self.lock:
+            files = sorted(
+                self.index["files"].items(), key=lambda item: item[1]["last_access"]
+            )
+            total_size = self.size()
+            for sha256, file in files:
+                if total_size <= self.max_size:
+                    break
+                if sha256 == keep:
+                    continue
+                self._remove_file(sha256)
+                total_size -= file["size"]
+            self._save_index()
+
+    def remove(self, url: str):
+        """Remove the URL and its file, unless the file is shared with other URLs."""
+        with self.lock:
+            entry = self.index["urls"].pop(url, None)
+            if entry is not None and not any(
+                e["sha256"] == entry["sha256"] for e in self.index["urls"].values()
+            ):
+                self._remove_file(entry["sha256"])
+            self._save_index()
+
+    def clear(self):
+        with self.lock:
+            for sha256 in list(self.index["files"].keys()):
+                self._remove_file(sha256)
+            self.index = {"urls": {}, "files": {}}
+            self._save_index()
+
+    def _remove_file(self, sha256: str):
+        self.index["files"].pop(sha256, None)
+        self.index["urls"] = {
+            url: entry
+            for url, entry in self.index["urls"].items()
+            if entry["sha256"] != sha256
+        }
+        if os.path.exists(self._file_path(sha256)):
+            os.remove(self._file_path(sha256))
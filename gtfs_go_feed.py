@@ -0,0 +1,425 @@
+import csv
+import glob
+import hashlib
+import io
+import os
+import shutil
+import threading
+import uuid
+import zipfile
+from contextlib import contextmanager
+from dataclasses import fields
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Tweeked to import gtfs_parser for Python 3.11
+try:
+    from gtfs_parser import gtfs_parser
+except ImportError:
+    # Python 3.9 or 3.10
+    import gtfs_parser
+
+# pyarrow is optional, snapshots are not used without it
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    pa_csv = None
+    feather = None
+
+SNAPSHOT_EXT = ".feather"
+HASH_CHUNK_SIZE = 1024 * 1024
+# in names of snapshots, incremented when tables are written differently,
+# so that snapshots of older versions are not read and evicted in time
+SNAPSHOT_VERSION = 2
+
+# columns of stop_times read by gtfs_parser and GTFS-GO, others are never loaded
+STOP_TIMES_COLUMNS = ("trip_id", "departure_time", "stop_id", "stop_sequence")
+
+# dtypes of columns in compact mode. Columns grouped or merged by gtfs_parser,
+# such as ids, are kept as text, because categories change its results.
+COMPACT_DTYPES = {
+    "stop_times": {
+        "departure_time": "category",
+        "stop_sequence": "int32",
+    },
+    "trips": {
+        "service_id": "category",
+        "trip_headsign": "category",
+        "direction_id": "category",
+        "block_id": "category",
+        "wheelchair_accessible": "category",
+        "bikes_allowed": "category",
+    },
+    "stops": {"location_type": "int8"},
+    "shapes": {"shape_pt_sequence": "int32"},
+}
+
+
+def load_gtfs(
+    gtfs_path: str,
+    snapshot_dir: Optional[str] = None,
+    max_size: Optional[int] = None,
+    sha256: Optional[str] = None,
+    compact=False,
+):
+    """
+    Load GTFS as gtfs_parser.GTFSFactory does, using snapshot cache.
+    Parsed tables are written in Arrow IPC (Feather) format keyed by SHA-256 of the zip file,
+    and they are memory-mapped in later runs instead of re-parsing CSV files.
+    stop_times is read on first access in both cases, see read_gtfs() and read_snapshot().
+
+    Args:
+        gtfs_path (str): path of zip file or directory
+        snapshot_dir (str, optional): directory to store snapshots. Snapshots are not used if None.
+        max_size (int, optional): max total size of snapshots in bytes. Unlimited if None.
+        sha256 (str, optional): SHA-256 of zip file if it is already known.
+        compact (bool): convert columns to COMPACT_DTYPES to use less memory.
+
+    Returns:
+        gtfs_parser.GTFS: dataclass of GTFS tables
+    """
+    if feather is None or snapshot_dir is None or not os.path.isfile(gtfs_path):
+        return read_gtfs(gtfs_path, compact=compact)
+
+    snapshot_path = os.path.join(
+        snapshot_dir, get_snapshot_name(sha256 or file_sha256(gtfs_path), compact)
+    )
+    if os.path.isdir(snapshot_path):
+        # update mtime for LRU eviction
+        os.utime(snapshot_path)
+        return read_snapshot(snapshot_path, compact=compact)
+
+    # tables except stop_times are read to be written, snapshot is also smaller
+    # in compact mode. stop_times is converted from the zip file by batches.
+    gtfs = read_gtfs(gtfs_path, compact=compact)
+    write_snapshot(gtfs, snapshot_path, gtfs_path)
+    if max_size is not None:
+        evict_snapshots(snapshot_dir, max_size, keep=snapshot_path)
+    return gtfs
+
+
+def file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, mode="rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def get_snapshot_name(sha256: str, compact: bool) -> str:
+    # tables of compact mode have other dtypes
+    name = f"{sha256}.v{SNAPSHOT_VERSION}"
+    return name + ".compact" if compact else name
+
+
+class LazyGTFS(gtfs_parser.GTFS):
+    """
+    GTFS whose tables are loaded on first access of the attribute.
+
+    Args:
+        tables (dict): tables already loaded, None for missing tables
+        loaders (dict): {table name: Callable returning the table}
+    """
+
+    def __init__(self, tables: dict, loaders: dict):
+        # GTFS.__init__() is not called not to load all tables
+        self.__dict__.update(tables)
+        self._loaders = loaders
+        self._lock = threading.Lock()
+
+    def __getattribute__(self, name: str):
+        # __getattr__() is not enough, optional tables have defaults in class
+        attributes = object.__getattribute__(self, "__dict__")
+        if name in attributes.get("_loaders", ()) and name not in attributes:
+            with attributes["_lock"]:
+                if name not in attributes:
+                    attributes[name] = attributes["_loaders"][name]()
+        return object.__getattribute__(self, name)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self.__dict__
+
+
+@contextmanager
+def _open_table(gtfs_path: str, filename: str):
+    if os.path.isdir(gtfs_path):
+        with open(os.path.join(gtfs_path, filename), encoding="utf-8_sig") as f:
+            yield f
+    else:
+        # streamed from the zip file without extracting it
+        with zipfile.ZipFile(gtfs_path) as z, z.open(filename) as f:
+            yield f
+
+
+def _list_tables(gtfs_path: str) -> dict:
+    if os.path.isdir(gtfs_path):
+        filenames = [
+            os.path.basename(path)
+            for path in glob.glob(os.path.join(gtfs_path, "*.txt"))
+        ]
+    elif os.path.isfile(gtfs_path):
+        with zipfile.ZipFile(gtfs_path) as z:
+            filenames = [
+                name
+                for name in z.namelist()
+                if name.endswith(".txt") and os.path.basename(name) == name
+            ]
+    else:
+        raise FileNotFoundError(f"zip file not found. ({gtfs_path})")
+
+    table_names = {field.name for field in fields(gtfs_parser.GTFS)}
+    return {
+        os.path.splitext(filename)[0]: filename
+        for filename in filenames
+        if os.path.splitext(filename)[0] in table_names
+    }
+
+
+def read_stop_times(gtfs_path: str, filename: str, compact=False) -> pd.DataFrame:
+    """
+    Read only STOP_TIMES_COLUMNS of stop_times.txt, with dtypes of gtfs_parser.
+    """
+    with _open_table(gtfs_path, filename) as f:
+        stop_times = pd.read_csv(
+            f,
+            dtype=str,
+            keep_default_na=False,
+            na_values={""},
+            usecols=lambda column: column in STOP_TIMES_COLUMNS,
+        )
+    stop_times["stop_sequence"] = stop_times["stop_sequence"].astype(int)
+    return compact_table("stop_times", stop_times) if compact else stop_times
+
+
+def read_gtfs(gtfs_path: str, compact=False) -> LazyGTFS:
+    """
+    Read GTFS as gtfs_parser.GTFSFactory does, except stop_times.txt,
+    the largest table, is read on first access and only STOP_TIMES_COLUMNS are read.
+
+    Args:
+        gtfs_path (str): path of zip file or directory
+        compact (bool): convert columns to COMPACT_DTYPES to use less memory.
+    """
+    filenames = _list_tables(gtfs_path)
+    if len(filenames) == 0:
+        raise FileNotFoundError(
+            "txt files must be in the root level directory, not in a sub folder."
+        )
+
+    tables = {field.name: None for field in fields(gtfs_parser.GTFS)}
+    loaders = {}
+    for table_name, filename in filenames.items():
+        if table_name == "stop_times":
+            del tables[table_name]
+            loaders[table_name] = lambda filename=filename: read_stop_times(
+                gtfs_path, filename, compact=compact
+            )
+            continue
+        with _open_table(gtfs_path, filename) as f:
+            tables[table_name] = gtfs_parser.gtfs.load_df(f, table_name)
+
+    # set agency_id when there is a single agency, as GTFSFactory does
+    if len(tables["agency"]) == 1:
+        if "agency_id" not in tables["agency"].columns or pd.isnull(
+            tables["agency"]["agency_id"].iloc[0]
+        ):
+            tables["agency"]["agency_id"] = ""
+        tables["routes"]["agency_id"] = tables["agency"]["agency_id"].iloc[0]
+
+    if compact:
+        for table_name, table in tables.items():
+            if table is not None:
+                compact_table(table_name, table)
+    return LazyGTFS(tables, loaders)
+
+
+def compact_table(table_name: str, table: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert columns to COMPACT_DTYPES in place. Integers are left as
+    they are if they don't fit.
+    """
+    for column, dtype in COMPACT_DTYPES.get(table_name, {}).items():
+        if column not in table or table[column].dtype == dtype:
+            continue
+        if dtype != "category":
+            info = np.iinfo(dtype)
+            values = table[column]
+            if len(values) > 0 and (values.min() < info.min or values.max() > info.max):
+                continue
+        table[column] = table[column].astype(dtype)
+    return table
+
+
+def time_to_seconds(times: pd.Series) -> np.ndarray:
+    """
+    Args:
+        times (pd.Series): "hh:mm:ss" or "h:mm:ss", hours can be more than 24.
+
+    Returns:
+        np.ndarray: int32 seconds since midnight, -1 for missing times
+    """
+    # each distinct time is parsed once
+    codes, uniques = pd.factorize(times)
+    seconds = np.array(
+        [hhmmss_to_seconds(time.replace(":", "")) for time in uniques] + [-1],
+        dtype=np.int32,
+    )
+    # code of missing time is -1, the last one
+    return seconds[codes]
+
+
+def hhmmss_to_seconds(hhmmss: str) -> int:
+    value = int(hhmmss)
+    return value // 10000 * 3600 + value // 100 % 100 * 60 + value % 100
+
+
+def read_snapshot_table(table_path: str, columns: Optional[tuple] = None):
+    table = feather.read_table(table_path, columns=columns, memory_map=True)
+    df = table.to_pandas()
+    # missing values in CSV are NaN but Arrow restores them as None
+    for column in table.schema:
+        if column.type == "string" and table[column.name].null_count > 0:
+            df[column.name] = df[column.name].where(df[column.name].notna(), np.nan)
+    return df
+
+
+def read_snapshot(snapshot_path: str, compact=False) -> LazyGTFS:
+    """
+    Each table is read on first access, only STOP_TIMES_COLUMNS of stop_times.
+    """
+    tables = {}
+    loaders = {}
+    for field in fields(gtfs_parser.GTFS):
+        table_path = os.path.join(snapshot_path, field.name + SNAPSHOT_EXT)
+        if not os.path.exists(table_path):
+            tables[field.name] = None
+            continue
+        columns = None
+        if field.name == "stop_times":
+            schema = feather.read_table(table_path, memory_map=True).schema
+            columns = [name for name in schema.names if name in STOP_TIMES_COLUMNS]
+        loaders[field.name] = _make_snapshot_loader(
+            field.name, table_path, columns, compact
+        )
+    return LazyGTFS(tables, loaders)
+
+
+def _make_snapshot_loader(
+    table_name: str, table_path: str, columns: Optional[list], compact: bool
+) -> Callable:
+    def load():
+        table = read_snapshot_table(table_path, columns)
+        return compact_table(table_name, table) if compact else table
+
+    return load
+
+
+def write_stop_times_snapshot(gtfs_path: str, filename: str, table_path: str):
+    """
+    Convert STOP_TIMES_COLUMNS of stop_times.txt in the zip file to a snapshot
+    table by batches, with the same values as read_stop_times().
+
+    Raises:
+        pa.ArrowException: when rows have fewer fields than the header,
+            which pandas and gtfs_parser accept.
+    """
+    with _open_table(gtfs_path, filename) as f:
+        header = next(csv.reader(io.TextIOWrapper(f, encoding="utf-8_sig")))
+    columns = [column for column in header if column in STOP_TIMES_COLUMNS]
+    with _open_table(gtfs_path, filename) as f:
+        reader = pa_csv.open_csv(
+            f,
+            convert_options=pa_csv.ConvertOptions(
+                column_types={
+                    column: pa.int64() if column == "stop_sequence" else pa.string()
+                    for column in columns
+                },
+                include_columns=columns,
+                # only empty values are missing, as gtfs_parser reads
+                null_values=[""],
+                strings_can_be_null=True,
+            ),
+        )
+        with pa.ipc.new_file(table_path, reader.schema) as writer:
+            for batch in reader:
+                writer.write_batch(batch)
+
+
+def write_snapshot(gtfs, snapshot_path: str, gtfs_path: Optional[str] = None):
+    """
+    Args:
+        gtfs (gtfs_parser.GTFS): tables to write
+        snapshot_path (str): directory of the snapshot
+        gtfs_path (str, optional): zip file of gtfs. stop_times not loaded yet
+            is converted from it, not to load the largest table only to write it.
+    """
+    # write to temporary directory and rename it, not to leave incomplete snapshot
+    temp_path = snapshot_path + "-" + str(uuid.uuid4())
+    os.makedirs(temp_path)
+    try:
+        for field in fields(gtfs):
+            table_path = os.path.join(temp_path, field.name + SNAPSHOT_EXT)
+            if (
+                field.name == "stop_times"
+                and gtfs_path is not None
+                and isinstance(gtfs, LazyGTFS)
+                and not gtfs.is_loaded("stop_times")
+            ):
+                write_stop_times_snapshot(
+                    gtfs_path, _list_tables(gtfs_path)["stop_times"], table_path
+                )
+                continue
+            table = getattr(gtfs, field.name)
+            if table is not None:
+                feather.write_feather(table, table_path)
+        os.replace(temp_path, snapshot_path)
+    except OSError:
+        # the same feed is written by another thread or disk is full
+        pass
+    except pa.ArrowException:
+        # stop_times.txt which pyarrow can't parse, such as rows without
+        # trailing empty fields. It is read by pandas on access without snapshot.
+        pass
+    finally:
+        if os.path.exists(temp_path):
+            shutil.rmtree(temp_path)
+
+
+def get_snapshot_size(snapshot_path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(snapshot_path, filename))
+        for filename in os.listdir(snapshot_path)
+    )
+
+
+def evict_snapshots(snapshot_dir: str, max_size: int, keep: Optional[str] = None):
+    """
+    Remove least recently used snapshots until total size is under max_size.
+    """
+    snapshot_paths = sorted(
+        [
+            os.path.join(snapshot_dir, name)
+            for name in os.listdir(snapshot_dir)
+            if os.path.isdir(os.path.join(snapshot_dir, name)) and "-" not in name
+        ],
+        key=os.path.getmtime,
+    )
+    sizes = {path: get_snapshot_size(path) for path in snapshot_paths}
+    total_size = sum(sizes.values())
+    for snapshot_path in snapshot_paths:
+        if total_size <= max_size:
+            break
+        if snapshot_path == keep:
+            continue
+        shutil.rmtree(snapshot_path, ignore_errors=True)
+        total_size -= sizes[snapshot_path]
+
+
+def clear_snapshots(snapshot_dir: str):
+    if os.path.exists(snapshot_dir):
+        shutil.rmtree(snapshot_dir)
@@ -0,0 +1,136 @@
+import json
+from typing import Iterable, Optional
+
+from qgis.core import QgsFeature, QgsGeometry, QgsPointXY, QgsVectorLayer
+
+# field types of memory provider
+FIELD_TYPES = {bool: "integer", int: "long", float: "double", str: "string"}
+
+
+def _to_points(coordinates) -> list:
+    return [QgsPointXY(x, y) for x, y, *_ in coordinates]
+
+
+def _make_geometry(geometry: dict) -> QgsGeometry:
+    geometry_type = geometry["type"]
+    coordinates = geometry["coordinates"]
+    if geometry_type == "Point":
+        return QgsGeometry.fromPointXY(QgsPointXY(coordinates[0], coordinates[1]))
+    if geometry_type == "MultiPoint":
+        return QgsGeometry.fromMultiPointXY(_to_points(coordinates))
+    if geometry_type == "LineString":
+        return QgsGeometry.fromPolylineXY(_to_points(coordinates))
+    if geometry_type == "MultiLineString":
+        return QgsGeometry.fromMultiPolylineXY([_to_points(c) for c in coordinates])
+    if geometry_type == "Polygon":
+        return QgsGeometry.fromPolygonXY([_to_points(c) for c in coordinates])
+    if geometry_type == "MultiPolygon":
+        return QgsGeometry.fromMultiPolygonXY(
+            [[_to_points(c) for c in polygon] for polygon in coordinates]
+        )
+    raise ValueError(f"unsupported geometry type: {geometry_type}")
+
+
+def _get_field_type(current: Optional[str], value) -> Optional[str]:
+    if value is None:
+        return current
+    field_type = FIELD_TYPES.get(type(value), "string")
+    if current is None or current == field_type:
+        return field_type
+    # int and float are mixed in the same field
+    if {current, field_type} <= {"integer", "long", "double"}:
+        return "double"
+    return "string"
+
+
+def _to_field_value(value, field_type: str):
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    if field_type == "string":
+        return str(value)
+    if field_type == "integer":
+        return int(value)
+    return value
+
+
+class MemoryLayerSource:
+    """
+    Features converted from GeoJSON-Feature-dicts to QgsFeature, not written to disk.
+    It is made in a task and turned into a layer of memory provider in the main thread,
+    because a layer must live in the main thread.
+
+    Args:
+        geometry_type (str): WKB type name such as "LineString", "None" for a table.
+        fields (list): list of tuple, (name, type of memory provider)
+        features (list): list of QgsFeature, attributes are in order of fields.
+    """
+
+    def __init__(self, geometry_type: str, fields: list, features: list):
+        self.geometry_type = geometry_type
+        self.fields = fields
+        self.features = features
+
+    @classmethod
+    def _from_records(cls, records: Iterable[tuple]):
+        geometry_type = "None"
+        field_types = {}
+        geometries_and_properties = []
+        for geometry, properties in records:
+            if geometry is not None and geometry_type == "None":
+                geometry_type = geometry["type"]
+            for name, value in properties.items():
+                field_types[name] = _get_field_type(field_types.get(name), value)
+            geometries_and_properties.append(
+                (None if geometry is None else _make_geometry(geometry), properties)
+            )
+
+        fields = [
+            (name, field_type or "string") for name, field_type in field_types.items()
+        ]
+        features = []
+        for geometry, properties in geometries_and_properties:
+            feature = QgsFeature()
+            if geometry is not None:
+                feature.setGeometry(geometry)
+            feature.setAttributes(
+                [
+                    _to_field_value(properties.get(name), field_type)
+                    for name, field_type in fields
+                ]
+            )
+            features.append(feature)
+        return cls(geometry_type, fields, features)
+
+    @classmethod
+    def from_features(cls, features: Iterable[dict]):
+        """
+        Args:
+            features (Iterable[dict]): GeoJSON-Feature-dicts
+        """
+        return cls._from_records(
+            (feature["geometry"], feature["properties"]) for feature in features
+        )
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]):
+        """
+        Args:
+            rows (Iterable[dict]): rows without geometry
+        """
+        return cls._from_records((None, row) for row in rows)
+
+    def make_uri(self) -> str:
+        params = ["crs=EPSG:4326"] if self.geometry_type != "None" else []
+        params += [f"field={name}:{field_type}" for name, field_type in self.fields]
+        return self.geometry_type + "?" + "&".join(params)
+
+    def make_layer(self, layer_name: str) -> QgsVectorLayer:
+        """
+        Must be called in the main thread.
+        """
+        layer = QgsVectorLayer(self.make_uri(), layer_name, "memory")
+        layer.dataProvider().addFeatures(self.features)
+        layer.updateExtents()
+        return layer
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import re
+from typing import Optional
+
+from gtfs_go_settings import ROUTES_COLOR_LIST
+
+# route_color of GTFS is 6-digit hex without "#"
+ROUTE_COLOR_PATTERN = re.compile(r"^#?([0-9a-fA-F]{6})$")
+
+
+def get_palette_index(key: str, palette_size: int) -> int:
+    """
+    Stable index for the key, Python's hash() is salted per process.
+    """
+    digest = hashlib.sha1(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % palette_size
+
+
+def parse_route_color(route_color) -> Optional[str]:
+    """
+    Returns:
+        Optional[str]: "#RRGGBB", None if route_color is empty or invalid.
+    """
+    if not isinstance(route_color, str):
+        return None
+    match = ROUTE_COLOR_PATTERN.match(route_color.strip())
+    if match is None:
+        return None
+    return "#" + match.group(1).upper()
+
+
+class RouteColorPalette:
+    """
+    Colors of routes, route_color of GTFS is used when it is set,
+    otherwise a color of the palette is chosen by hash of route_id.
+    Chosen colors are kept in a JSON file, so routes keep their colors
+    across feeds and runs even if the palette is changed.
+
+    Args:
+        path (str, optional): JSON file to persist colors, not persisted if None.
+        max_entries (int): number of colors kept, older ones are dropped.
+        palette (list): color names or hex of QColor
+    """
+
+    def __init__(
+        self, path: Optional[str] = None, max_entries=10000, palette=ROUTES_COLOR_LIST
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.palette = palette
+        self.colors = self._load()
+        self.is_modified = False
+
+    def _load(self) -> dict:
+        if self.path is not None and os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                # broken file, colors are chosen again
+                pass
+        return {}
+
+    def save(self):
+        if self.path is None or not self.is_modified:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".tmp", mode="w", encoding="utf-8") as f:
+            json.dump(self.colors, f)
+        os.replace(self.path + ".tmp", self.path)
+        self.is_modified = False
+
+    def get_color(self, route_id: str, route_color=None) -> str:
+        """
+        Args:
+            route_id (str): route_id, or route_name when route_id is unknown
+            route_color (str, optional): route_color of GTFS
+
+        Returns:
+            str: color for QColor
+        """
+        color = parse_route_color(route_color)
+        if color is not None:
+            return color
+
+        if route_id not in self.colors:
+            self.colors[route_id] = self.palette[
+                get_palette_index(route_id, len(self.palette))
+            ]
+            # dict keeps insertion order, drop the oldest
+            while len(self.colors) > self.max_entries:
+                del self.colors[next(iter(self.colors))]
+            self.is_modified = True
+        return self.colors[route_id]
@@ -0,0 +1,388 @@
+"""
+Pipeline of GTFS-GO without QGIS, used by GTFSGoTask and from command line.
+
+    python gtfs_go_pipeline.py feed1.zip feed2.zip -o output --format GeoPackage
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional
+
+# Tweeked to import gtfs_parser for Python 3.11
+try:
+    from gtfs_parser import gtfs_parser
+except ImportError:
+    # Python 3.9 or 3.10
+    import gtfs_parser
+
+from gtfs_go_aggregate import AggregatorCache
+from gtfs_go_feed import LazyGTFS, file_sha256, load_gtfs
+from gtfs_go_settings import (
+    FEED_SNAPSHOT_DIR,
+    FEED_SNAPSHOT_MAX_SIZE,
+    PROCESS_WORKERS,
+    VECTOR_TILE_MAX_ZOOM,
+    VECTOR_TILE_MIN_ZOOM,
+)
+from gtfs_go_trace import StageTrace, format_record
+from gtfs_go_writer import (
+    OUTPUT_FORMATS,
+    VECTOR_TILE_FORMATS,
+    get_available_formats,
+    write_layer,
+    write_table,
+    write_vector_tiles,
+)
+
+# stages of processing a feed, used to calculate progress
+STAGES = ("download", "load", "simple", "aggregate", "write", "tile")
+
+DEFAULT_OPTIONS = {
+    "simple": True,
+    "ignore_shapes": False,
+    "ignore_no_route": False,
+    "aggregate": True,
+    "no_unify_stops": False,
+    "delimiter": "",
+    "yyyymmdd": "",
+    "begin_time": "",
+    "end_time": "",
+    "output_format": "GeoJSON",
+    "min_zoom": VECTOR_TILE_MIN_ZOOM,
+    "max_zoom": VECTOR_TILE_MAX_ZOOM,
+    "trace": False,
+}
+
+
+def collect_routes(features: Iterable[dict], routes: dict):
+    """
+    Yield features as they are, adding {route_name: (route_id, route_color)} to routes.
+    """
+    for feature in features:
+        properties = feature["properties"]
+        routes.setdefault(
+            properties.get("route_name"),
+            (properties.get("route_id"), properties.get("route_color")),
+        )
+        yield feature
+
+
+class FeedProcessor:
+    """
+    Load, aggregate and write a feed. Subclasses can override is_canceled(),
+    on_stage() and output_*() to report progress or to output without files.
+
+    Args:
+        options (dict): processing options, see DEFAULT_OPTIONS.
+        aggregator_cache (AggregatorCache, optional): cache shared between feeds and runs.
+        trace (StageTrace, optional): records time and memory of each stage.
+        feed_name (str): name of the feed in trace
+    """
+
+    def __init__(
+        self,
+        options: dict,
+        aggregator_cache: Optional[AggregatorCache] = None,
+        trace: Optional[StageTrace] = None,
+        feed_name="",
+    ):
+        self.options = {**DEFAULT_OPTIONS, **options}
+        self.aggregator_cache = aggregator_cache or AggregatorCache(max_feeds=1)
+        self.trace = trace or StageTrace()
+        self.feed_name = feed_name
+
+    def is_canceled(self) -> bool:
+        return False
+
+    def on_stage(self, stage: str):
+        pass
+
+    def writes_files(self) -> bool:
+        return True
+
+    def output_layer(
+        self, output_dir: str, layer_name: str, features, tile_layers: dict
+    ):
+        if self.options["output_format"] in VECTOR_TILE_FORMATS:
+            # tiled after all layers are made
+            tile_layers[layer_name] = features
+            return ""
+        return write_layer(
+            output_dir, layer_name, features, self.options["output_format"]
+        )
+
+    def output_table(self, output_dir: str, layer_name: str, rows):
+        return write_table(output_dir, layer_name, rows, self.options["output_format"])
+
+    def load_stop_times(self, gtfs):
+        # read on first access, recorded as its own stage not to be counted in parsing
+        if isinstance(gtfs, LazyGTFS) and not gtfs.is_loaded("stop_times"):
+            with self.trace.measure(self.feed_name, "load stop_times"):
+                gtfs.stop_times
+
+    def process(self, path: str, output_dir: str) -> Optional[dict]:
+        """
+        Args:
+            path (str): path to zip file or directory of GTFS
+            output_dir (str): directory to write results
+
+        Returns:
+            Optional[dict]: {written_files: dict, routes: dict}, None if canceled.
+                Values of written_files are data sources returned by output_*().
+        """
+        if self.is_canceled():
+            return None
+
+        written_files = {
+            "routes": "",
+            "stops": "",
+            "aggregated_routes": "",
+            "aggregated_stops": "",
+            "aggregated_csv": "",
+        }
+
+        # distinct routes to categorize them without scanning the layer
+        routes = {}
+        # features to be tiled after all layers are made
+        tile_layers = {}
+
+        self.on_stage("load")
+        with self.trace.measure(self.feed_name, "load"):
+            feed_key = file_sha256(path) if os.path.isfile(path) else path
+            gtfs = self.aggregator_cache.get_gtfs(
+                feed_key,
+                lambda: load_gtfs(
+                    path,
+                    FEED_SNAPSHOT_DIR,
+                    FEED_SNAPSHOT_MAX_SIZE,
+                    sha256=feed_key,
+                    compact=True,
+                ),
+            )
+        if self.is_canceled():
+            return None
+
+        # made after the feed is loaded, not to leave it empty for a broken feed
+        if self.writes_files():
+            os.makedirs(output_dir, exist_ok=True)
+
+        if self.options["simple"]:
+            self.on_stage("simple")
+            with self.trace.measure(self.feed_name, "parse routes"):
+                route_features = gtfs_parser.parse.read_routes(
+                    gtfs, ignore_shapes=self.options["ignore_shapes"]
+                )
+            with self.trace.measure(self.feed_name, "write routes"):
+                written_files["routes"] = self.output_layer(
+                    output_dir,
+                    "routes",
+                    collect_routes(route_features, routes),
+                    tile_layers,
+                )
+            # features are released as soon as they are written
+            del route_features
+            if self.is_canceled():
+                return None
+
+            self.load_stop_times(gtfs)
+            with self.trace.measure(self.feed_name, "parse stops"):
+                stop_features = gtfs_parser.parse.read_stops(
+                    gtfs,
+                    ignore_no_route=self.options["ignore_no_route"],
+                )
+            with self.trace.measure(self.feed_name, "write stops"):
+                written_files["stops"] = self.output_layer(
+                    output_dir, "stops", stop_features, tile_layers
+                )
+            del stop_features
+            if self.is_canceled():
+                return None
+
+        if self.options["aggregate"]:
+            self.on_stage("aggregate")
+            self.load_stop_times(gtfs)
+            with self.trace.measure(self.feed_name, "aggregate"):
+                aggregator = self.aggregator_cache.get_aggregator(
+                    feed_key,
+                    gtfs,
+                    no_unify_stops=self.options["no_unify_stops"],
+                    delimiter=self.options["delimiter"],
+                    yyyymmdd=self.options["yyyymmdd"],
+                    begin_time=self.options["begin_time"],
+                    end_time=self.options["end_time"],
+                )
+                # paths are counted here, features are made as they are written
+                route_frequency = aggregator.read_route_frequency()
+            if self.is_canceled():
+                return None
+
+            # each result of gtfs_parser is a list, made after the previous one
+            # is written and released
+            self.on_stage("write")
+            with self.trace.measure(self.feed_name, "write aggregated_routes"):
+                written_files["aggregated_routes"] = self.output_layer(
+                    output_dir, "aggregated_routes", route_frequency, tile_layers
+                )
+            del route_frequency
+
+            with self.trace.measure(self.feed_name, "aggregate stops"):
+                interpolated_stops = aggregator.read_interpolated_stops()
+            with self.trace.measure(self.feed_name, "write aggregated_stops"):
+                written_files["aggregated_stops"] = self.output_layer(
+                    output_dir, "aggregated_stops", interpolated_stops, tile_layers
+                )
+            del interpolated_stops
+
+            with self.trace.measure(self.feed_name, "aggregate relations"):
+                stop_relations = aggregator.read_stop_relations()
+            with self.trace.measure(self.feed_name, "write result"):
+                written_files["aggregated_csv"] = self.output_table(
+                    output_dir, "result", stop_relations
+                )
+            del stop_relations
+
+        if self.options["output_format"] in VECTOR_TILE_FORMATS:
+            self.on_stage("tile")
+            with self.trace.measure(self.feed_name, "write vector tiles"):
+                written_files["vector_tiles"] = write_vector_tiles(
+                    output_dir,
+                    tile_layers,
+                    self.options["output_format"],
+                    self.options["min_zoom"],
+                    self.options["max_zoom"],
+                )
+
+        return {"written_files": written_files, "routes": routes}
+
+
+def process_feed(path: str, output_dir: str, options: dict) -> dict:
+    """
+    Process a feed in a worker process.
+    """
+    trace = None
+    if options.get("trace"):
+        trace = StageTrace(
+            on_record=lambda record: print(format_record(record), file=sys.stderr)
+        )
+    processor = FeedProcessor(options, trace=trace, feed_name=get_feed_name(path))
+    return processor.process(path, output_dir)["written_files"]
+
+
+def get_feed_name(path: str) -> str:
+    # only the extension is dropped, "feed.2024.zip" is "feed.2024"
+    return os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+
+
+def get_output_names(paths: list) -> list:
+    """
+    Names of output subdirectories of paths, a suffix is added to repeated names,
+    such as "GTFS" and "GTFS_2" for "a/GTFS.zip" and "b/GTFS.zip".
+    """
+    names = []
+    used = set()
+    for path in paths:
+        name = get_feed_name(path)
+        number = 1
+        while name in used:
+            number += 1
+            name = f"{get_feed_name(path)}_{number}"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def run(paths: list, output_dir: str, options: dict, workers=PROCESS_WORKERS) -> dict:
+    """
+    Process feeds in parallel with worker processes,
+    results of each feed are written to a subdirectory named after the file,
+    with a suffix for repeated names.
+
+    Returns:
+        dict: {path: written_files or Exception}
+    """
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # each feed has its own directory, not to overwrite files of another
+        futures = {
+            path: executor.submit(
+                process_feed, path, os.path.join(output_dir, name), options
+            )
+            for path, name in zip(paths, get_output_names(paths))
+        }
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                results[path] = e
+    return results
+
+
+def parse_args(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(
+        description="Extract routes and stops from GTFS and aggregate frequency."
+    )
+    parser.add_argument("paths", nargs="+", help="zip files or directories of GTFS")
+    parser.add_argument("-o", "--output-dir", required=True)
+    parser.add_argument(
+        "--format",
+        dest="output_format",
+        choices=get_available_formats(OUTPUT_FORMATS + VECTOR_TILE_FORMATS),
+        default=DEFAULT_OPTIONS["output_format"],
+    )
+    parser.add_argument("--simple", action="store_true", help="only routes and stops")
+    parser.add_argument(
+        "--aggregate", action="store_true", help="only aggregated frequency"
+    )
+    parser.add_argument("--ignore-shapes", action="store_true")
+    parser.add_argument("--ignore-no-route", action="store_true")
+    parser.add_argument("--no-unify", action="store_true", help="don't unify stops")
+    parser.add_argument("--delimiter", default="", help="delimiter of stop_id")
+    parser.add_argument("--date", default="", help="YYYYMMDD")
+    parser.add_argument("--begin-time", default="", help="HHMMSS")
+    parser.add_argument("--end-time", default="", help="HHMMSS")
+    parser.add_argument("--min-zoom", type=int, default=VECTOR_TILE_MIN_ZOOM)
+    parser.add_argument("--max-zoom", type=int, default=VECTOR_TILE_MAX_ZOOM)
+    parser.add_argument("--workers", type=int, default=PROCESS_WORKERS)
+    parser.add_argument(
+        "--trace", action="store_true", help="print time and memory of each stage"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = parse_args(argv)
+    # both are done unless one of them is specified
+    is_both = not args.simple and not args.aggregate
+    options = {
+        "simple": args.simple or is_both,
+        "ignore_shapes": args.ignore_shapes,
+        "ignore_no_route": args.ignore_no_route,
+        "aggregate": args.aggregate or is_both,
+        "no_unify_stops": args.no_unify,
+        "delimiter": args.delimiter,
+        "yyyymmdd": args.date,
+        "begin_time": args.begin_time.replace(":", ""),
+        "end_time": args.end_time.replace(":", ""),
+        "output_format": args.output_format,
+        "min_zoom": args.min_zoom,
+        "max_zoom": args.max_zoom,
+        "trace": args.trace,
+    }
+
+    results = run(args.paths, args.output_dir, options, workers=args.workers)
+    has_error = False
+    for path, result in results.items():
+        if isinstance(result, Exception):
+            has_error = True
+            print(f"{path}: {result}", file=sys.stderr)
+        else:
+            for written_file in result.values():
+                if written_file:
+                    print(written_file)
+    return 1 if has_error else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from qgis.core import (
     QgsCategorizedSymbolRenderer,
     QgsRendererCategory,
@@ -11,8 +13,8 @@ from qgis.core import (
 from qgis.PyQt.QtCore import Qt
 from qgis.PyQt.QtGui import QColor
 
+from gtfs_go_palette import RouteColorPalette
 from gtfs_go_settings import (
-    ROUTES_COLOR_LIST,
     ROUTES_LINE_WIDTH_MM,
     ROUTES_OUTLINE_COLOR,
     ROUTES_OUTLINE_WIDTH_MM,
@@ -21,25 +23,38 @@ from gtfs_go_settings import (
     STOPS_SVG_PATH,
 )
 
-
-def _get_random_color():
-    import random
-
-    random_index = random.randrange(0, len(ROUTES_COLOR_LIST) - 1, 1)
-    return QColor(ROUTES_COLOR_LIST[random_index])
+# prebuilt symbols for each geometry type, cloned for each category
+_SYMBOL_TEMPLATES = {}
 
 
 class Renderer:
-    def __init__(self, target_layer: QgsVectorLayer, target_field_name: str):
+    """
+    Args:
+        target_layer (QgsVectorLayer): layer to be rendered
+        target_field_name (str): field to categorize features
+        target_field_values (dict, optional): distinct values of the field known by
+            the parser, {value: (route_id, route_color)}. Read from the provider if None.
+        palette (RouteColorPalette, optional): colors of categories, not persisted if None.
+    """
+
+    def __init__(
+        self,
+        target_layer: QgsVectorLayer,
+        target_field_name: str,
+        target_field_values: Optional[dict] = None,
+        palette: Optional[RouteColorPalette] = None,
+    ):
         self.target_layer = target_layer
         self.target_field_name = target_field_name
+        self.target_field_values = target_field_values
+        self.palette = palette or RouteColorPalette()
 
     def _is_point_layer(self):
         return (
             self.target_layer.geometryType() == QgsWkbTypes.GeometryType.PointGeometry
         )
 
-    def _make_symbol(self):
+    def _make_symbol_template(self):
         symbol = QgsSymbol.defaultSymbol(self.target_layer.geometryType())
         if self._is_point_layer():
             symbol_layer = QgsSvgMarkerSymbolLayer(STOPS_SVG_PATH)
@@ -54,24 +69,37 @@ class Renderer:
             line_layer = symbol.symbolLayer(0)
             line_layer.setPenJoinStyle(Qt.PenJoinStyle.RoundJoin)
             line_layer.setWidth(ROUTES_LINE_WIDTH_MM)
-            line_layer.setColor(_get_random_color())
             outline_layer = symbol.symbolLayer(0).clone()
             outline_layer.setColor(QColor(ROUTES_OUTLINE_COLOR))
             outline_layer.setWidth(ROUTES_OUTLINE_WIDTH_MM)
             symbol.insertSymbolLayer(0, outline_layer)
         return symbol
 
+    def _make_symbol(self, color: Optional[QColor] = None):
+        geometry_type = self.target_layer.geometryType()
+        if geometry_type not in _SYMBOL_TEMPLATES:
+            _SYMBOL_TEMPLATES[geometry_type] = self._make_symbol_template()
+        symbol = _SYMBOL_TEMPLATES[geometry_type].clone()
+        if color is not None:
+            # line layer is above the outline layer at index 0
+            symbol.symbolLayer(1).setColor(color)
+        return symbol
+
+    def _get_target_field_values(self):
+        if self.target_field_values is not None:
+            return self.target_field_values
+        field_index = self.target_layer.fields().indexOf(self.target_field_name)
+        return {
+            value: (None, None) for value in self.target_layer.uniqueValues(field_index)
+        }
+
     def _make_categories_by(self):
         categories = []
-        # get all target field value with removing dupulicates
-        target_field_values = set(
-            [
-                feature.attribute(self.target_field_name)
-                for feature in self.target_layer.getFeatures()
-            ]
-        )
-        for value in target_field_values:
-            symbol = self._make_symbol()
+        target_field_values = self._get_target_field_values()
+        for value in sorted(target_field_values, key=str):
+            route_id, route_color = target_field_values[value]
+            color = self.palette.get_color(route_id or str(value), route_color)
+            symbol = self._make_symbol(QColor(color))
             category = QgsRendererCategory(value, symbol, value)
             categories.append(category)
         return categories
@@ -1,4 +1,5 @@
 import os
+import sys
 
 FILENAME_RESULT_CSV = "result.csv"
 
@@ -34,3 +35,49 @@ ROUTES_COLOR_LIST = [
     "palevioletred",
     "gold",
 ]
+
+# number of feeds downloaded or processed at the same time
+DOWNLOAD_WORKERS = 4
+PROCESS_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
+
+
+def _get_user_cache_dir():
+    if sys.platform == "win32":
+        return os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~"), "Library", "Caches")
+    return os.environ.get(
+        "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+    )
+
+
+CACHE_DIR = os.path.join(_get_user_cache_dir(), "GTFSGo")
+
+# downloaded zip files are kept across runs
+DOWNLOAD_CACHE_DIR = os.path.join(CACHE_DIR, "downloads")
+DOWNLOAD_CACHE_MAX_SIZE = 2 * 1024**3
+# seconds to use cached file without asking the server whether it is modified
+DOWNLOAD_CACHE_MAX_AGE = 24 * 60 * 60
+
+# parsed GTFS tables are kept as Feather files when pyarrow is available
+FEED_SNAPSHOT_DIR = os.path.join(CACHE_DIR, "snapshots")
+FEED_SNAPSHOT_MAX_SIZE = 4 * 1024**3
+
+# feeds kept in memory with intermediate results of aggregation while QGIS is running
+SESSION_CACHE_MAX_FEEDS = 2
+
+# colors chosen for routes, to keep them between runs
+ROUTE_COLORS_PATH = os.path.join(CACHE_DIR, "route_colors.json")
+
+# responses of Japan DPF searches, reused for seconds of ttl
+JAPAN_DPF_CACHE_DIR = os.path.join(CACHE_DIR, "japan_dpf")
+JAPAN_DPF_CACHE_TTL = 60 * 60
+# files catalogue of Japan DPF to search offline, after synced once
+JAPAN_DPF_CATALOGUE_PATH = os.path.join(CACHE_DIR, "japan_dpf_catalogue.sqlite")
+
+# zoom levels of vector tiles for web maps
+VECTOR_TILE_MIN_ZOOM = 5
+VECTOR_TILE_MAX_ZOOM = 14
+
+# milliseconds after QGIS startup to import heavy modules in background
+PREWARM_DELAY_MS = 5000
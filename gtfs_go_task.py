@@ -0,0 +1,240 @@
+import cProfile
+import os
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional
+
+from qgis.core import Qgis, QgsMessageLog, QgsTask
+
+from gtfs_go_aggregate import AggregatorCache
+from gtfs_go_download import DownloadCache
+from gtfs_go_memory import MemoryLayerSource
+from gtfs_go_pipeline import STAGES, FeedProcessor
+from gtfs_go_settings import DOWNLOAD_WORKERS, PROCESS_WORKERS
+from gtfs_go_trace import StageTrace, format_record
+from gtfs_go_writer import VECTOR_TILE_FORMATS
+
+# output format to make memory layers without writing files
+MEMORY_FORMAT = "Memory"
+
+PROFILE_FILENAME = "gtfs_go_profile_{}.prof"
+
+
+def log_record(record: dict):
+    # QgsMessageLog is thread-safe
+    QgsMessageLog.logMessage(format_record(record), "GTFS-GO", Qgis.MessageLevel.Info)
+
+
+class TaskFeedProcessor(FeedProcessor):
+    """
+    FeedProcessor reporting progress to the task,
+    layers are made in memory to be shown in QGIS unless files are written.
+    """
+
+    def __init__(self, task, feed_idx: int):
+        super().__init__(
+            task.options,
+            task.aggregator_cache,
+            task.trace,
+            task.feed_infos[feed_idx]["group"],
+        )
+        self.task = task
+        self.feed_idx = feed_idx
+
+    def is_canceled(self) -> bool:
+        return self.task.isCanceled()
+
+    def on_stage(self, stage: str):
+        self.task.set_stage_progress(self.feed_idx, stage)
+
+    def writes_files(self) -> bool:
+        return self.options["output_format"] != MEMORY_FORMAT
+
+    def output_layer(
+        self, output_dir: str, layer_name: str, features, tile_layers: dict
+    ):
+        if self.options["output_format"] == MEMORY_FORMAT:
+            return MemoryLayerSource.from_features(features)
+        if self.options["output_format"] in VECTOR_TILE_FORMATS:
+            # shown from memory in QGIS, and tiled for web maps
+            features = list(features)
+            tile_layers[layer_name] = features
+            return MemoryLayerSource.from_features(features)
+        return super().output_layer(output_dir, layer_name, features, tile_layers)
+
+    def output_table(self, output_dir: str, layer_name: str, rows):
+        if (
+            self.options["output_format"] == MEMORY_FORMAT
+            or self.options["output_format"] in VECTOR_TILE_FORMATS
+        ):
+            return MemoryLayerSource.from_rows(rows)
+        return super().output_table(output_dir, layer_name, rows)
+
+
+class GTFSGoTask(QgsTask):
+    """
+    Run the whole pipeline - download, parse, aggregate and write -
+    in background not to freeze QGIS.
+
+    Args:
+        feed_infos (list): list of dict, {path: str, group: str, dir: str, cache_key: Optional[str]}
+        output_dir (str): directory to write results, subdirectory for each feed is made.
+            Not used with MEMORY_FORMAT.
+        download_cache (DownloadCache): cache of downloaded zip files.
+        aggregator_cache (AggregatorCache): cache of loaded feeds and aggregation in this session.
+        options (dict): processing options read from UI in the main thread.
+            With options["trace"], memory is traced and a cProfile dump of each feed
+            is written to output_dir.
+    """
+
+    def __init__(
+        self,
+        feed_infos: list,
+        output_dir: str,
+        download_cache: DownloadCache,
+        aggregator_cache: AggregatorCache,
+        options: dict,
+    ):
+        super().__init__("GTFS-GO", QgsTask.Flag.CanCancel)
+        self.feed_infos = feed_infos
+        self.output_dir = output_dir
+        self.download_cache = download_cache
+        self.aggregator_cache = aggregator_cache
+        self.options = options
+
+        # results are read in the main thread after the task finished
+        self.results = []
+        self.errors = []
+
+        # progress of each feed, updated from worker threads
+        self.stage_progresses = [0.0] * len(feed_infos)
+        self.progress_lock = threading.Lock()
+
+        # time and memory of each stage, logged as they finish
+        self.trace = StageTrace(on_record=log_record)
+
+    def run(self):
+        # tracing memory allocated by Python is slow, it is done only on request
+        starts_tracing = self.options["trace"] and not tracemalloc.is_tracing()
+        try:
+            if self.options["trace"]:
+                os.makedirs(self.output_dir, exist_ok=True)
+            if starts_tracing:
+                tracemalloc.start()
+            return self.run_feeds()
+        except Exception as e:
+            # an exception raised from run() is not shown to the user
+            self.errors.append(str(e))
+            return False
+        finally:
+            if starts_tracing:
+                tracemalloc.stop()
+
+    def run_feeds(self):
+        results = [None] * len(self.feed_infos)
+        errors = [None] * len(self.feed_infos)
+
+        # downloads are I/O bound and processing is CPU bound, so they run on
+        # separate pools: a feed is processed as soon as its download finished.
+        # feeds are processed one by one to profile, only one profiler can be active.
+        process_workers = 1 if self.options["trace"] else PROCESS_WORKERS
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as download_executor:
+            with ThreadPoolExecutor(max_workers=process_workers) as process_executor:
+                download_futures = {
+                    download_executor.submit(self.download_feed, feed_idx, feed_info): (
+                        feed_idx
+                    )
+                    for feed_idx, feed_info in enumerate(self.feed_infos)
+                }
+                process_futures = {}
+                for future in as_completed(download_futures):
+                    feed_idx = download_futures[future]
+                    try:
+                        path = future.result()
+                    except Exception as e:
+                        errors[feed_idx] = e
+                        continue
+                    if path is None or self.isCanceled():
+                        break
+                    process_futures[
+                        process_executor.submit(
+                            self.process_feed, feed_idx, self.feed_infos[feed_idx], path
+                        )
+                    ] = feed_idx
+
+                for future in as_completed(process_futures):
+                    feed_idx = process_futures[future]
+                    try:
+                        results[feed_idx] = future.result()
+                    except Exception as e:
+                        errors[feed_idx] = e
+
+        if self.isCanceled():
+            return False
+
+        # merge in the order of feed_infos to keep the layer tree stable
+        for feed_info, result, error in zip(self.feed_infos, results, errors):
+            if error is not None:
+                self.errors.append(f"{feed_info['group']}: {error}")
+            elif result is not None:
+                self.results.append(result)
+        return True
+
+    def set_stage_progress(self, feed_idx: int, stage: str, fraction=0.0):
+        with self.progress_lock:
+            self.stage_progresses[feed_idx] = (STAGES.index(stage) + fraction) / len(
+                STAGES
+            )
+            self.setProgress(
+                sum(self.stage_progresses) / len(self.stage_progresses) * 100
+            )
+
+    def download_feed(self, feed_idx: int, feed_info: dict) -> Optional[str]:
+        """
+        Returns:
+            Optional[str]: path to local zip file, downloaded if path is URL.
+                None if canceled.
+        """
+        if self.isCanceled():
+            return None
+        self.set_stage_progress(feed_idx, "download")
+        if not feed_info["path"].startswith("http"):
+            return feed_info["path"]
+
+        def on_progress(downloaded: int, total: Optional[int]):
+            if total:
+                self.set_stage_progress(feed_idx, "download", downloaded / total)
+
+        with self.trace.measure(feed_info["group"], "download"):
+            return self.download_cache.fetch(
+                feed_info["path"],
+                key=feed_info.get("cache_key"),
+                progress_callback=on_progress,
+                is_canceled=self.isCanceled,
+            )
+
+    def process_feed(self, feed_idx: int, feed_info: dict, path: str):
+        """
+        Returns:
+            Optional[dict]: {group: str, written_files: dict, routes: dict},
+                None if canceled.
+                Values of written_files are data sources or MemoryLayerSource.
+        """
+        processor = TaskFeedProcessor(self, feed_idx)
+        output_dir = os.path.join(self.output_dir, feed_info["dir"])
+        if self.options["trace"]:
+            profile = cProfile.Profile()
+            try:
+                result = profile.runcall(processor.process, path, output_dir)
+            finally:
+                profile.dump_stats(
+                    os.path.join(
+                        self.output_dir, PROFILE_FILENAME.format(feed_info["dir"])
+                    )
+                )
+        else:
+            result = processor.process(path, output_dir)
+        if result is None:
+            return None
+        return {"group": feed_info["group"], **result}
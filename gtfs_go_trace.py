@@ -0,0 +1,95 @@
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# psutil is optional, peak RSS of resource is used without it
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# resource is not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+TRACE_FILENAME = "gtfs_go_trace.json"
+
+
+def get_rss_mb() -> Optional[float]:
+    """
+    Returns:
+        Optional[float]: current RSS with psutil, otherwise peak RSS of the process.
+            None if neither is available.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024**2
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macOS, kilobytes on Linux
+        return max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+    return None
+
+
+def format_record(record: dict) -> str:
+    text = f"{record['feed']}: {record['stage']} {record['seconds']:.3f} s"
+    if record["rss_delta_mb"] is not None:
+        text += f", RSS {record['rss_delta_mb']:+.1f} MB"
+    if record["traced_peak_mb"] is not None:
+        text += f", traced peak {record['traced_peak_mb']:.1f} MB"
+    return text
+
+
+class StageTrace:
+    """
+    Time and memory of each stage of processing feeds, shared between threads.
+    Memory allocated by Python is traced only while tracemalloc is tracing,
+    and stages running at the same time share its peak.
+
+    Args:
+        on_record (Callable, optional): called with each record, from any thread.
+    """
+
+    def __init__(self, on_record: Optional[Callable[[dict], None]] = None):
+        self.on_record = on_record
+        self.records = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, feed: str, stage: str):
+        started_at = time.perf_counter()
+        rss_before = get_rss_mb()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            rss_after = get_rss_mb()
+            record = {
+                "feed": feed,
+                "stage": stage,
+                "thread": threading.current_thread().name,
+                "seconds": round(time.perf_counter() - started_at, 4),
+                "rss_mb": rss_after,
+                "rss_delta_mb": None
+                if rss_before is None
+                else round(rss_after - rss_before, 2),
+                "traced_peak_mb": round(tracemalloc.get_traced_memory()[1] / 1024**2, 2)
+                if tracemalloc.is_tracing()
+                else None,
+            }
+            with self.lock:
+                self.records.append(record)
+            if self.on_record is not None:
+                self.on_record(record)
+
+    def write_json(self, path: str):
+        with self.lock:
+            records = list(self.records)
+        with open(path, mode="w", encoding="utf-8") as f:
+            json.dump({"records": records}, f, ensure_ascii=False, indent=2)
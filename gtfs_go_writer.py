@@ -0,0 +1,399 @@
+import csv
+import itertools
+import json
+import os
+from typing import Iterable, Optional
+
+# GDAL is bundled with QGIS but optional for GeoJSON output
+try:
+    from osgeo import ogr, osr
+except ImportError:
+    ogr = None
+    osr = None
+
+OUTPUT_FORMATS = ("GeoJSON", "GeoPackage", "FlatGeobuf")
+GEOPACKAGE_FILENAME = "gtfs.gpkg"
+
+# archives of Mapbox Vector Tiles for web maps, written by GDAL
+VECTOR_TILE_FORMATS = ("MBTiles", "PMTiles")
+VECTOR_TILE_EXTENSIONS = {"MBTiles": ".mbtiles", "PMTiles": ".pmtiles"}
+VECTOR_TILE_FILENAME = "gtfs"
+# tolerance of simplification in tile pixels, applied at each zoom level
+VECTOR_TILE_SIMPLIFICATION = 1.0
+
+# data-defined sizes of aggregated_routes.qml and aggregated_stops.qml in mm,
+# written as attributes for styling in web maps
+STYLE_HINTS = {
+    "aggregated_routes": (
+        "line_width",
+        lambda properties: 0.05 + (properties["frequency"] ** 0.6) * 0.2,
+    ),
+    "aggregated_stops": (
+        "symbol_size",
+        lambda properties: 0.8 + 0.2 * properties["count"] ** 0.5,
+    ),
+}
+
+# OGR drivers of output formats, GeoJSON is written without GDAL.
+# PMTiles driver is available since GDAL 3.8
+OGR_DRIVER_NAMES = {
+    "GeoPackage": "GPKG",
+    "FlatGeobuf": "FlatGeobuf",
+    "MBTiles": "MBTiles",
+    "PMTiles": "PMTiles",
+}
+
+FEATURE_COLLECTION_HEADER = '{"type": "FeatureCollection", "features": ['
+FEATURE_COLLECTION_FOOTER = "]}"
+
+
+def write_geojson(path: str, features: Iterable[dict]) -> int:
+    """
+    Write GeoJSON FeatureCollection by encoding one feature at a time,
+    so that the encoded collection is never held as a string. Features are
+    held only as much as the given iterable holds them.
+    Output is same as json.dump() of {"type": "FeatureCollection", "features": [...]}.
+
+    Args:
+        path (str): path to GeoJSON file
+        features (Iterable[dict]): GeoJSON-Feature-dicts, list or generator
+
+    Returns:
+        int: number of written features
+    """
+    count = 0
+    with open(path, mode="w", encoding="utf-8") as f:
+        f.write(FEATURE_COLLECTION_HEADER)
+        for feature in features:
+            if count > 0:
+                f.write(", ")
+            f.write(json.dumps(feature, ensure_ascii=False))
+            count += 1
+        f.write(FEATURE_COLLECTION_FOOTER)
+    return count
+
+
+def write_csv(path: str, rows: Iterable[dict]) -> int:
+    """
+    Write rows to CSV, header is made from keys of the first row.
+
+    Returns:
+        int: number of written rows
+    """
+    count = 0
+    with open(path, mode="w", encoding="utf-8", errors="ignore", newline="") as f:
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(f, fieldnames=row.keys())
+                writer.writeheader()
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def get_available_formats(formats: Iterable[str]) -> tuple:
+    """
+    Returns:
+        tuple: formats whose OGR driver is available in GDAL, in the same order
+    """
+    return tuple(
+        output_format
+        for output_format in formats
+        if output_format not in OGR_DRIVER_NAMES
+        or (
+            ogr is not None
+            and ogr.GetDriverByName(OGR_DRIVER_NAMES[output_format]) is not None
+        )
+    )
+
+
+def write_layer(
+    output_dir: str, layer_name: str, features: Iterable[dict], output_format: str
+) -> str:
+    """
+    Write features as a layer in the output format.
+
+    Args:
+        output_dir (str): directory to write
+        layer_name (str): name of file or layer, such as "routes"
+        features (Iterable[dict]): GeoJSON-Feature-dicts
+        output_format (str): one of OUTPUT_FORMATS
+
+    Returns:
+        str: data source of the layer to be loaded by OGR provider
+    """
+    if output_format == "GeoJSON":
+        path = os.path.join(output_dir, layer_name + ".geojson")
+        write_geojson(path, features)
+        return path
+    if output_format == "GeoPackage":
+        path = os.path.join(output_dir, GEOPACKAGE_FILENAME)
+        OgrWriter(path, "GPKG").write_features(layer_name, features)
+        return f"{path}|layername={layer_name}"
+    if output_format == "FlatGeobuf":
+        # one layer per file, with packed Hilbert R-tree for bbox-filtered reads
+        path = os.path.join(output_dir, layer_name + ".fgb")
+        OgrWriter(path, "FlatGeobuf").write_features(layer_name, features)
+        return path
+    raise ValueError(f"unsupported output format: {output_format}")
+
+
+def add_style_hints(layer_name: str, features: Iterable[dict]):
+    """
+    Yield copies of features with an attribute of STYLE_HINTS,
+    features are not modified because they may be cached.
+    """
+    if layer_name not in STYLE_HINTS:
+        yield from features
+        return
+    name, calculate = STYLE_HINTS[layer_name]
+    for feature in features:
+        properties = dict(feature["properties"])
+        properties[name] = round(calculate(properties), 3)
+        yield {**feature, "properties": properties}
+
+
+def write_vector_tiles(
+    output_dir: str,
+    layers: dict,
+    output_format: str,
+    min_zoom: int,
+    max_zoom: int,
+) -> str:
+    """
+    Tile layers into an archive of Mapbox Vector Tiles.
+    Features are clipped, simplified for each zoom level and encoded by GDAL.
+
+    Args:
+        output_dir (str): directory to write
+        layers (dict): {layer_name: Iterable of GeoJSON-Feature-dicts}
+        output_format (str): one of VECTOR_TILE_FORMATS
+        min_zoom (int): min zoom level of tiles
+        max_zoom (int): max zoom level of tiles
+
+    Returns:
+        str: path to the archive
+    """
+    path = os.path.join(
+        output_dir, VECTOR_TILE_FILENAME + VECTOR_TILE_EXTENSIONS[output_format]
+    )
+    writer = OgrWriter(
+        path,
+        output_format,
+        dataset_options=[
+            f"MINZOOM={min_zoom}",
+            f"MAXZOOM={max_zoom}",
+            f"SIMPLIFICATION={VECTOR_TILE_SIMPLIFICATION}",
+            f"NAME={VECTOR_TILE_FILENAME}",
+        ],
+        layer_options=[],
+    )
+    writer.write_layers(
+        {
+            layer_name: add_style_hints(layer_name, features)
+            for layer_name, features in layers.items()
+        }
+    )
+    return path
+
+
+def write_table(
+    output_dir: str, layer_name: str, rows: Iterable[dict], output_format: str
+) -> str:
+    """
+    Write rows without geometry as a table, CSV except for GeoPackage.
+    FlatGeobuf is for geometries, so CSV is written with it.
+
+    Returns:
+        str: data source of the table to be loaded by OGR provider
+    """
+    if output_format == "GeoPackage":
+        path = os.path.join(output_dir, GEOPACKAGE_FILENAME)
+        OgrWriter(path, "GPKG").write_rows(layer_name, rows)
+        return f"{path}|layername={layer_name}"
+    path = os.path.join(output_dir, layer_name + ".csv")
+    write_csv(path, rows)
+    return path
+
+
+class OgrWriter:
+    """
+    Write GeoJSON-Feature-dicts to a data source of OGR, one feature at a time.
+    Layers are created with spatial index and overwritten if they exist.
+    For formats which can't be updated, such as FlatGeobuf, existing file is overwritten.
+    Fields are made from properties, lists and dicts are stored as JSON text.
+
+    Args:
+        path (str): path to data source, opened in update mode if exists.
+        driver_name (str): OGR driver, such as "GPKG"
+        dataset_options (list, optional): creation options of data source
+        layer_options (list, optional): creation options of layers,
+            spatial index is created if None.
+    """
+
+    GEOMETRY_TYPES = {
+        "Point": "wkbPoint",
+        "MultiPoint": "wkbMultiPoint",
+        "LineString": "wkbLineString",
+        "MultiLineString": "wkbMultiLineString",
+        "Polygon": "wkbPolygon",
+        "MultiPolygon": "wkbMultiPolygon",
+    }
+
+    # drivers which can't be updated in place, all layers are written at once
+    NOT_UPDATABLE_DRIVERS = ("FlatGeobuf", "MBTiles", "PMTiles")
+
+    def __init__(
+        self,
+        path: str,
+        driver_name: str,
+        dataset_options: Optional[list] = None,
+        layer_options: Optional[list] = None,
+    ):
+        if ogr is None:
+            raise ImportError("GDAL Python bindings (osgeo) are required")
+        self.path = path
+        self.driver_name = driver_name
+        self.dataset_options = dataset_options or []
+        self.layer_options = layer_options
+
+    def _open(self):
+        driver = ogr.GetDriverByName(self.driver_name)
+        if driver is None:
+            raise ValueError(
+                f"OGR driver {self.driver_name} is not available in this GDAL, "
+                "please update QGIS or choose another output format"
+            )
+        if os.path.exists(self.path) and self.driver_name in self.NOT_UPDATABLE_DRIVERS:
+            driver.DeleteDataSource(self.path)
+        if os.path.exists(self.path):
+            datasource = ogr.Open(self.path, update=1)
+        else:
+            datasource = driver.CreateDataSource(
+                self.path, options=self.dataset_options
+            )
+        if datasource is None:
+            raise OSError(f"failed to open {self.path}")
+        return datasource
+
+    @staticmethod
+    def _make_srs():
+        srs = osr.SpatialReference()
+        srs.ImportFromEPSG(4326)
+        # lon, lat order as GeoJSON
+        srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        return srs
+
+    @staticmethod
+    def _field_type(value):
+        # bool is subclass of int
+        if isinstance(value, bool):
+            return ogr.OFTInteger
+        if isinstance(value, int):
+            return ogr.OFTInteger64
+        if isinstance(value, float):
+            return ogr.OFTReal
+        return ogr.OFTString
+
+    @staticmethod
+    def _field_value(value):
+        if isinstance(value, (list, tuple, dict)):
+            return json.dumps(value, ensure_ascii=False)
+        if isinstance(value, bool):
+            return int(value)
+        return value
+
+    def _create_layer(self, datasource, layer_name: str, geometry_type, srs):
+        if datasource.GetLayerByName(layer_name) is not None:
+            datasource.DeleteLayer(layer_name)
+        if self.layer_options is not None:
+            options = self.layer_options
+        elif geometry_type != ogr.wkbNone:
+            options = ["SPATIAL_INDEX=YES"]
+        else:
+            options = []
+        return datasource.CreateLayer(
+            layer_name, srs=srs, geom_type=geometry_type, options=options
+        )
+
+    def _write(
+        self, datasource, layer_name: str, records: Iterable[dict], spatial: bool
+    ) -> int:
+        records = iter(records)
+        first = next(records, None)
+        if first is not None:
+            records = itertools.chain([first], records)
+        if spatial:
+            geometry_type = (
+                getattr(ogr, self.GEOMETRY_TYPES[first["geometry"]["type"]])
+                if first is not None
+                else ogr.wkbUnknown
+            )
+            srs = self._make_srs()
+        else:
+            geometry_type = ogr.wkbNone
+            srs = None
+
+        layer = self._create_layer(datasource, layer_name, geometry_type, srs)
+        field_names = set()
+        count = 0
+        layer.StartTransaction()
+        for record in records:
+            properties = record["properties"] if spatial else record
+            for name, value in properties.items():
+                if name not in field_names:
+                    layer.CreateField(ogr.FieldDefn(name, self._field_type(value)))
+                    field_names.add(name)
+
+            feature = ogr.Feature(layer.GetLayerDefn())
+            for name, value in properties.items():
+                if value is None:
+                    feature.SetFieldNull(name)
+                else:
+                    feature.SetField(name, self._field_value(value))
+            if spatial:
+                feature.SetGeometry(
+                    ogr.CreateGeometryFromJson(json.dumps(record["geometry"]))
+                )
+            layer.CreateFeature(feature)
+            count += 1
+        layer.CommitTransaction()
+        return count
+
+    def write_layers(self, layers: dict) -> dict:
+        """
+        Write layers to a data source opened once.
+
+        Args:
+            layers (dict): {layer_name: Iterable of GeoJSON-Feature-dicts}
+
+        Returns:
+            dict: {layer_name: number of written features}
+        """
+        datasource = self._open()
+        counts = {
+            layer_name: self._write(datasource, layer_name, features, spatial=True)
+            for layer_name, features in layers.items()
+        }
+        # flush and close
+        datasource = None
+        return counts
+
+    def write_features(self, layer_name: str, features: Iterable[dict]) -> int:
+        """
+        Returns:
+            int: number of written features
+        """
+        return self.write_layers({layer_name: features})[layer_name]
+
+    def write_rows(self, layer_name: str, rows: Iterable[dict]) -> int:
+        """
+        Returns:
+            int: number of written rows
+        """
+        datasource = self._open()
+        count = self._write(datasource, layer_name, rows, spatial=False)
+        # flush and close
+        datasource = None
+        return count
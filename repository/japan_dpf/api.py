@@ -1,57 +1,209 @@
+import hashlib
 import json
+import os
+import threading
+import time
+from typing import Optional
 
 from qgis.core import QgsNetworkAccessManager
-from qgis.PyQt.QtCore import QT_VERSION_STR, QEventLoop, QTextStream, QUrl
+from qgis.PyQt.QtCore import (
+    QT_VERSION_STR,
+    QObject,
+    QTextStream,
+    QTimer,
+    QUrl,
+    pyqtSignal,
+)
 from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
 
 QT_VERSION_INT = int(QT_VERSION_STR.split(".")[0])
 
 DPF_API_URL = "https://api.gtfs-data.jp/v2"
 
+# number of feeds added to the table at once
+PAGE_SIZE = 100
 
-def __fetch(url: str) -> dict:
+
+def _read_json(reply: QNetworkReply) -> dict:
+    text_stream = QTextStream(reply)
+    if QT_VERSION_INT <= 5:
+        text_stream.setCodec("UTF-8")
+    else:
+        from qgis.PyQt.QtCore import QStringConverter
+
+        text_stream.setEncoding(QStringConverter.Encoding.Utf8)
+    text = text_stream.readAll()
+    return json.loads(text)
+
+
+def make_files_url(target_date: Optional[str], extent=None, pref=None) -> str:
+    """
+    files of all dates are listed without target_date
     """
-    Fetch data via http in QGIS-manner
-    reponse must be  JSON-text
+    params = []
+    params += [] if target_date is None else [f"target_date={target_date}"]
+    params += [] if extent is None else ["extent=" + extent]
+    params += [] if pref is None else [f"pref={pref}"]
+    return DPF_API_URL + "/files?" + "&".join(params)
+
+
+class ResponseCache:
+    """
+    Feeds responded for each URL, kept in memory and on disk until ttl expires.
+    The URL is made from target_date, extent and pref.
 
     Args:
-        url (str): [description]
+        cache_dir (str, optional): directory to store responses, only in memory if None.
+        ttl (int): seconds to use cached response.
+    """
+
+    def __init__(self, cache_dir: Optional[str], ttl: int):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def _file_path(self, url: str) -> str:
+        return os.path.join(
+            self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json"
+        )
 
-    Raises:
-        Exception: [description]
+    def get(self, url: str) -> Optional[list]:
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None and self.cache_dir is not None:
+                try:
+                    with open(self._file_path(url), encoding="utf-8") as f:
+                        entry = json.load(f)
+                    self.entries[url] = entry
+                except (OSError, ValueError):
+                    return None
+            if entry is None or time.time() - entry["fetched_at"] > self.ttl:
+                return None
+            return entry["feeds"]
 
-    Returns:
-        dict: decode JSON-text as python-dictionary
+    def set(self, url: str, feeds: list):
+        entry = {"fetched_at": time.time(), "feeds": feeds}
+        with self.lock:
+            self.entries[url] = entry
+            if self.cache_dir is None:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._file_path(url)
+            with open(path + ".tmp", mode="w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+            if self.cache_dir is not None and os.path.exists(self.cache_dir):
+                for filename in os.listdir(self.cache_dir):
+                    os.remove(os.path.join(self.cache_dir, filename))
+
+
+class FeedsClient(QObject):
     """
-    event_loop = QEventLoop()
-    nam = QgsNetworkAccessManager.instance()
-    req = QNetworkRequest(QUrl(url))
-    reply = nam.get(req)
-    reply.finished.connect(event_loop.quit)
-    if QT_VERSION_INT <= 5:
-        event_loop.exec_()
-    else:
-        event_loop.exec(QEventLoop.ProcessEventsFlag.AllEvents)
-    if reply.error() == QNetworkReply.NetworkError.NoError:
-        text_stream = QTextStream(reply)
-        if QT_VERSION_INT <= 5:
-            text_stream.setCodec("UTF-8")
-        else:
-            from qgis.PyQt.QtCore import QStringConverter
+    Search feeds without blocking the UI, via signals of QgsNetworkAccessManager.
+    Feeds are emitted by pages, so that the table is filled as they are processed.
+    A new search cancels the previous one.
+    fetch_catalogue() lists files of all dates at once, to sync the local catalogue.
+    It has its own reply and is canceled only by cancel_catalogue(), not by searches.
 
-            text_stream.setEncoding(QStringConverter.Encoding.Utf8)
-        text = text_stream.readAll()
-        return json.loads(text)
-    else:
-        raise Exception(reply.error())
+    Args:
+        cache (ResponseCache): cache of responses
+    """
+
+    pageReceived = pyqtSignal(list)
+    catalogueReceived = pyqtSignal(list)
+    catalogueFailed = pyqtSignal(str)
+    catalogueCanceled = pyqtSignal()
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, cache: ResponseCache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.reply = None
+        self.catalogue_reply = None
+        # incremented on each search, to drop pages of superseded searches
+        self.generation = 0
+
+    def search(self, target_date: str, extent=None, pref=None):
+        self.cancel()
+        url = make_files_url(target_date, extent, pref)
+        feeds = self.cache.get(url)
+        if feeds is not None:
+            self._emit_pages(feeds, 0, self.generation)
+            return
+
+        self.reply = self._get(
+            url, lambda feeds: self._on_searched(feeds, url), self.failed.emit
+        )
 
+    def fetch_catalogue(self):
+        self.cancel_catalogue()
+        self.catalogue_reply = self._get(
+            make_files_url(None), self.catalogueReceived.emit, self.catalogueFailed.emit
+        )
 
-def get_feeds(target_date: str, extent=None, pref=None) -> list:
-    url = DPF_API_URL + "/files?"
-    url += f"target_date={target_date}"
-    url += "" if extent is None else "&extent=" + extent
-    url += "" if pref is None else f"&pref={pref}"
+    def is_fetching_catalogue(self) -> bool:
+        return self.catalogue_reply is not None
 
-    res = __fetch(url)
-    feeds = res.get("body", [])
-    return feeds
+    def cancel(self):
+        """
+        Cancel the search, fetching catalogue goes on.
+        """
+        self.generation += 1
+        if self.reply is not None:
+            reply = self.reply
+            self.reply = None
+            reply.abort()
+
+    def cancel_catalogue(self):
+        if self.catalogue_reply is not None:
+            reply = self.catalogue_reply
+            self.catalogue_reply = None
+            reply.abort()
+            self.catalogueCanceled.emit()
+
+    def _get(self, url: str, on_feeds, on_failed) -> QNetworkReply:
+        reply = QgsNetworkAccessManager.instance().get(QNetworkRequest(QUrl(url)))
+        reply.finished.connect(lambda: self._on_finished(reply, on_feeds, on_failed))
+        return reply
+
+    def _on_finished(self, reply: QNetworkReply, on_feeds, on_failed):
+        reply.deleteLater()
+        if reply is self.reply:
+            self.reply = None
+        elif reply is self.catalogue_reply:
+            self.catalogue_reply = None
+        else:
+            # aborted or superseded
+            return
+
+        if reply.error() != QNetworkReply.NetworkError.NoError:
+            on_failed(reply.errorString())
+            return
+        try:
+            feeds = _read_json(reply).get("body", [])
+        except ValueError as e:
+            on_failed(str(e))
+            return
+        on_feeds(feeds)
+
+    def _on_searched(self, feeds: list, url: str):
+        self.cache.set(url, feeds)
+        self._emit_pages(feeds, 0, self.generation)
+
+    def _emit_pages(self, feeds: list, start: int, generation: int):
+        if generation != self.generation:
+            return
+        self.pageReceived.emit(feeds[start : start + PAGE_SIZE])
+        if start + PAGE_SIZE < len(feeds):
+            # next page after the table is painted
+            QTimer.singleShot(
+                0, lambda: self._emit_pages(feeds, start + PAGE_SIZE, generation)
+            )
+        else:
+            self.finished.emit()
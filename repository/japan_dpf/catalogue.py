@@ -0,0 +1,222 @@
+"""
+Local copy of the Japan DPF files catalogue in SQLite, to search feeds offline.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Optional
+
+# bounding box of stops of a file, when the API provides it
+BBOX_KEYS = ("file_min_lon", "file_max_lon", "file_min_lat", "file_max_lat")
+
+# stored as user_version of the database, tables of older versions are rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    file_uid TEXT NOT NULL UNIQUE,
+    organization_id TEXT,
+    feed_id TEXT,
+    feed_pref_id INTEGER,
+    from_date TEXT,
+    to_date TEXT,
+    last_updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_feed_pref_id ON files (feed_pref_id);
+CREATE INDEX IF NOT EXISTS files_dates ON files (from_date, to_date);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+RTREE_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS files_bbox
+USING rtree(id, min_lon, max_lon, min_lat, max_lat)
+"""
+
+# same columns without R-tree module, queries are the same
+BBOX_TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files_bbox (
+    id INTEGER PRIMARY KEY, min_lon REAL, max_lon REAL, min_lat REAL, max_lat REAL
+)
+"""
+
+
+def get_bbox(feed: dict) -> Optional[tuple]:
+    """
+    Returns:
+        Optional[tuple]: (min_lon, max_lon, min_lat, max_lat), None if unknown
+    """
+    try:
+        return tuple(float(feed[key]) for key in BBOX_KEYS)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _get_date(feed: dict, key: str) -> Optional[str]:
+    # compared as YYYY-MM-DD text, time is dropped if any
+    value = feed.get(key)
+    return value[:10] if value else None
+
+
+class Catalogue:
+    """
+    Files of Japan DPF indexed by prefecture, validity dates and bounding box.
+    A connection is opened for each call, so that it can be used from any thread.
+
+    Args:
+        path (str): path to SQLite database, created on first sync.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            # synced again from scratch
+            conn.executescript(
+                "DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS files_bbox; "
+                f"DROP TABLE IF EXISTS meta; PRAGMA user_version = {SCHEMA_VERSION};"
+            )
+        conn.executescript(SCHEMA)
+        try:
+            conn.execute(RTREE_SCHEMA)
+        except sqlite3.OperationalError:
+            # SQLite built without R-tree module
+            conn.execute(BBOX_TABLE_SCHEMA)
+        return conn
+
+    def is_synced(self) -> bool:
+        return self.get_synced_at() is not None
+
+    def get_synced_at(self) -> Optional[float]:
+        if not os.path.exists(self.path):
+            return None
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value FROM meta WHERE key = 'synced_at'"
+            ).fetchone()
+        return None if row is None else float(row[0])
+
+    def has_bbox(self) -> bool:
+        """
+        Returns:
+            bool: whether any file has bounding box, to be searched by extent
+        """
+        if not os.path.exists(self.path):
+            return False
+        with closing(self._connect()) as conn:
+            return (
+                conn.execute("SELECT 1 FROM files_bbox LIMIT 1").fetchone() is not None
+            )
+
+    def sync(self, feeds: list) -> dict:
+        """
+        Update the catalogue with files listed by the API. Only files added
+        or whose file_last_updated_at changed are written, and files no longer
+        listed are removed.
+
+        Returns:
+            dict: numbers of added, updated and removed files
+        """
+        counts = {"added": 0, "updated": 0, "removed": 0}
+        with closing(self._connect()) as conn, conn:
+            stored = {
+                file_uid: (file_id, last_updated_at)
+                for file_id, file_uid, last_updated_at in conn.execute(
+                    "SELECT id, file_uid, last_updated_at FROM files"
+                )
+            }
+            listed = set()
+            for feed in feeds:
+                file_uid = feed["file_uid"]
+                listed.add(file_uid)
+                last_updated_at = feed.get("file_last_updated_at")
+                if file_uid in stored:
+                    file_id, stored_updated_at = stored[file_uid]
+                    if stored_updated_at == last_updated_at:
+                        continue
+                    conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+                    conn.execute("DELETE FROM files_bbox WHERE id = ?", (file_id,))
+                    counts["updated"] += 1
+                else:
+                    counts["added"] += 1
+
+                file_id = conn.execute(
+                    "INSERT INTO files (file_uid, organization_id, feed_id, "
+                    "feed_pref_id, from_date, to_date, last_updated_at, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        file_uid,
+                        feed.get("organization_id"),
+                        feed.get("feed_id"),
+                        feed.get("feed_pref_id"),
+                        _get_date(feed, "file_from_date"),
+                        _get_date(feed, "file_to_date"),
+                        last_updated_at,
+                        json.dumps(feed, ensure_ascii=False),
+                    ),
+                ).lastrowid
+                bbox = get_bbox(feed)
+                if bbox is not None:
+                    conn.execute(
+                        "INSERT INTO files_bbox VALUES (?, ?, ?, ?, ?)",
+                        (file_id, *bbox),
+                    )
+
+            for file_uid in stored.keys() - listed:
+                file_id = stored[file_uid][0]
+                conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+                conn.execute("DELETE FROM files_bbox WHERE id = ?", (file_id,))
+                counts["removed"] += 1
+
+            conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('synced_at', ?)", (time.time(),)
+            )
+        return counts
+
+    def search(
+        self, target_date: str, extent: Optional[tuple] = None, pref=None
+    ) -> list:
+        """
+        Same filters as the API, the latest file of each feed valid on target_date.
+
+        Args:
+            target_date (str): YYYY-MM-DD
+            extent (tuple, optional): (xmin, ymin, xmax, ymax) in EPSG:4326.
+                Files without bounding box are filtered out, see has_bbox().
+            pref (int, optional): prefecture code
+
+        Returns:
+            list: feeds as returned by the API
+        """
+        where = [
+            "(from_date IS NULL OR from_date <= :date)",
+            "(to_date IS NULL OR to_date >= :date)",
+        ]
+        params = {"date": target_date}
+        if pref is not None:
+            where.append("feed_pref_id = :pref")
+            params["pref"] = int(pref)
+        if extent is not None:
+            where.append(
+                "(id IN (SELECT id FROM files_bbox WHERE min_lon <= :xmax "
+                "AND max_lon >= :xmin AND min_lat <= :ymax AND max_lat >= :ymin))"
+            )
+            params.update(zip(("xmin", "ymin", "xmax", "ymax"), extent))
+
+        # data of the row having MAX(from_date) is selected in each group,
+        # feed_id is unique only in an organization
+        query = (
+            "SELECT data, MAX(from_date) FROM files WHERE "
+            + " AND ".join(where)
+            + " GROUP BY organization_id, COALESCE(feed_id, file_uid)"
+            + " ORDER BY feed_pref_id, id"
+        )
+        with closing(self._connect()) as conn:
+            return [json.loads(row[0]) for row in conn.execute(query, params)]
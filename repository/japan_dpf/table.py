@@ -1,4 +1,11 @@
-from qgis.PyQt.QtCore import QAbstractTableModel, Qt
+from qgis.PyQt.QtCore import (
+    QAbstractTableModel,
+    QModelIndex,
+    QSortFilterProxyModel,
+    Qt,
+)
+
+import constants
 
 HEADERS = (
     "organization_id",
@@ -67,48 +74,88 @@ HEADERS_TO_HIDE = (
 )
 
 
+# column of each header, not to look up headers on each paint
+COLUMN_INDEX = {header: idx for idx, header in enumerate(HEADERS)}
+
+# values to sort by, compared case-sensitively by the proxy model
+SORT_ROLE = Qt.ItemDataRole.UserRole
+# text of organization and feed of the row, for filtering
+FILTER_ROLE = Qt.ItemDataRole.UserRole + 1
+FILTER_HEADERS = ("organization", "feed")
+
+
+def _get_value(result: dict, header: str):
+    if header == "pref":
+        # replace pref code to pref name
+        return constants.JAPAN_PREFS_CODE_TO_NAME.get(result.get("feed_pref_id"), "")
+    value = result.get(HEADER_TO_DATAHEADER[header])
+    return "" if value is None else value
+
+
+def _get_sort_key(result: dict, header: str, value):
+    if header == "pref":
+        # from north to south, as ordered by code
+        return result.get("feed_pref_id") or 0
+    return value.casefold() if isinstance(value, str) else value
+
+
 class Model(QAbstractTableModel):
+    """
+    Results of Japan DPF in columns, values and sort keys are made once when rows
+    are added. Results are not modified.
+    """
+
     def __init__(self, datalist: list, parent=None):
         QAbstractTableModel.__init__(self, parent)
-        self.datalist = datalist
         self.headers = HEADERS
+        self.columns = [[] for _ in self.headers]
+        self.sort_keys = [[] for _ in self.headers]
+        self.filter_texts = []
+        self._extend(datalist)
+
+    def _extend(self, datalist: list):
+        for header, column, sort_keys in zip(
+            self.headers, self.columns, self.sort_keys
+        ):
+            values = [_get_value(result, header) for result in datalist]
+            column.extend(values)
+            sort_keys.extend(
+                _get_sort_key(result, header, value)
+                for result, value in zip(datalist, values)
+            )
+        filter_columns = [self.columns[COLUMN_INDEX[h]] for h in FILTER_HEADERS]
+        self.filter_texts.extend(
+            "\n".join(str(column[row]) for column in filter_columns).casefold()
+            for row in range(len(self.filter_texts), len(self.columns[0]))
+        )
+
+    def append(self, datalist: list):
+        """
+        add rows to the end, views keep their selection and scroll position
+        """
+        if not datalist:
+            return
+        first = len(self.filter_texts)
+        self.beginInsertRows(QModelIndex(), first, first + len(datalist) - 1)
+        self._extend(datalist)
+        self.endInsertRows()
 
     def rowCount(self, parent):
-        return len(self.datalist)
+        return len(self.filter_texts)
 
     def columnCount(self, parent):
         return len(self.headers)
 
     def flags(self, index):
-        # return Qt.ItemIsEditable | Qt.ItemIsEnabled | Qt.ItemIsSelectable
         return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
 
-    def data(self, index, role):
-        """
-        if role == Qt.EditRole:
-            row = index.row()
-            column = index.column()
-            return self.list[row][column]
-        """
-
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
         if role == Qt.ItemDataRole.DisplayRole:
-            row = index.row()
-            column = index.column()
-            key = self.headers[column]
-            dataheader = HEADER_TO_DATAHEADER[key]
-            return self.datalist[row].get(dataheader, "")
-
-    """
-    def setData(self, index, value, role=Qt.EditRole):
-        row = index.row()
-        column = index.column()
-
-        if role == Qt.EditRole:
-            self.list[row][column] = value
-            self.dataChanged.emit(index, index)
-            return True
-        return False
-    """
+            return self.columns[index.column()][index.row()]
+        if role == SORT_ROLE:
+            return self.sort_keys[index.column()][index.row()]
+        if role == FILTER_ROLE:
+            return self.filter_texts[index.row()]
 
     def headerData(self, section, orientation, role):
         if role == Qt.ItemDataRole.DisplayRole:
@@ -119,3 +166,20 @@ class Model(QAbstractTableModel):
                     return "not implemented"
             else:
                 return section + 1
+
+
+class FilterProxyModel(QSortFilterProxyModel):
+    """
+    Sort by precomputed keys and filter rows by organization or feed containing text.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setDynamicSortFilter(True)
+        self.setSortRole(SORT_ROLE)
+        self.setFilterRole(FILTER_ROLE)
+        self.setFilterKeyColumn(0)
+
+    def set_filter_text(self, text: str):
+        # filter texts are casefolded in the model
+        self.setFilterFixedString(text.casefold())
@@ -0,0 +1,71 @@
+"""
+Small GTFS feed for tests, written as a zip file.
+"""
+
+import zipfile
+
+TABLES = {
+    "agency.txt": [
+        "agency_id,agency_name,agency_url,agency_timezone",
+        "A1,Test Bus,https://example.com,Asia/Tokyo",
+    ],
+    "stops.txt": [
+        "stop_id,stop_name,stop_lat,stop_lon,location_type,parent_station",
+        "S1,Station,35.0000,139.0000,1,",
+        "S1_1,Station,35.0001,139.0001,0,S1",
+        "S1_2,Station,35.0002,139.0001,0,S1",
+        "S2_A,Downtown,35.0100,139.0100,0,",
+        "S2_B,Downtown,35.0110,139.0110,0,",
+        "S3,Uptown,35.0200,139.0200,0,",
+        "S4,Uptown,35.0210,139.0200,0,",
+        "S5,Uptown,35.0900,139.0900,0,",
+    ],
+    "routes.txt": [
+        "route_id,agency_id,route_short_name,route_long_name,route_type,route_color",
+        "R1,A1,1,Main Line,3,FF0000",
+        "R2,A1,2,,3,",
+    ],
+    "trips.txt": [
+        "route_id,service_id,trip_id,shape_id",
+        "R1,WEEKDAY,T1,SH1",
+        "R1,WEEKDAY,T2,SH1",
+        "R1,WEEKEND,T3,SH1",
+        "R2,WEEKDAY,T4,",
+    ],
+    "stop_times.txt": [
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence",
+        "T1,07:00:00,07:00:00,S1_1,1",
+        "T1,07:10:00,07:10:00,S2_A,2",
+        "T1,07:20:00,07:20:00,S3,3",
+        "T2,08:00:00,08:00:00,S1_2,1",
+        "T2,08:10:00,08:10:00,S2_B,2",
+        "T2,08:20:00,08:20:00,S4,3",
+        "T3,25:00:00,25:00:00,S1_1,1",
+        "T3,25:10:00,25:10:00,S2_A,2",
+        "T4,09:00:00,09:00:00,S3,1",
+        "T4,09:30:00,09:30:00,S5,2",
+    ],
+    "calendar.txt": [
+        "service_id,monday,tuesday,wednesday,thursday,friday,saturday,sunday,start_date,end_date",
+        "WEEKDAY,1,1,1,1,1,0,0,20240101,20241231",
+        "WEEKEND,0,0,0,0,0,1,1,20240101,20241231",
+    ],
+    "calendar_dates.txt": [
+        "service_id,date,exception_type",
+        "WEEKDAY,20240101,2",
+        "WEEKEND,20240101,1",
+    ],
+    "shapes.txt": [
+        "shape_id,shape_pt_lat,shape_pt_lon,shape_pt_sequence",
+        "SH1,35.0001,139.0001,1",
+        "SH1,35.0100,139.0100,2",
+        "SH1,35.0200,139.0200,3",
+    ],
+}
+
+
+def write_gtfs_zip(path: str, tables=TABLES) -> str:
+    with zipfile.ZipFile(path, "w") as z:
+        for filename, lines in tables.items():
+            z.writestr(filename, "\n".join(lines) + "\n")
+    return path
@@ -0,0 +1,136 @@
+import os
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from gtfs_go_aggregate import (
+    MAX_DISTANCE_DEGREE,
+    Aggregator,
+    AggregatorCache,
+    calc_near_id_pair,
+)
+from gtfs_go_feed import load_gtfs
+
+from .gtfs_fixture import write_gtfs_zip
+
+PARAMS = [
+    {},
+    {"no_unify_stops": True},
+    {"delimiter": "_"},
+    {"yyyymmdd": "20240102"},
+    {"yyyymmdd": "20240101"},
+    {"begin_time": "070000", "end_time": "081000"},
+    {"yyyymmdd": "20240106", "begin_time": "240000", "end_time": "260000"},
+]
+
+
+class TestAggregatorCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # stop_times is read from the zip file on first access
+        cls.tempdir = tempfile.TemporaryDirectory()
+        cls.gtfs = load_gtfs(write_gtfs_zip(os.path.join(cls.tempdir.name, "feed.zip")))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+    def assert_same_results(self, aggregator, expected):
+        self.assertEqual(
+            list(aggregator.read_route_frequency()), expected.read_route_frequency()
+        )
+        self.assertEqual(
+            aggregator.read_interpolated_stops(), expected.read_interpolated_stops()
+        )
+        self.assertEqual(
+            aggregator.read_stop_relations(), expected.read_stop_relations()
+        )
+
+    def test_same_as_aggregator(self):
+        cache = AggregatorCache(max_feeds=1)
+        for params in PARAMS:
+            with self.subTest(**params):
+                self.assert_same_results(
+                    cache.get_aggregator("feed", self.gtfs, **params),
+                    Aggregator(self.gtfs, **params),
+                )
+
+    def test_unify_skipped(self):
+        cache = AggregatorCache(max_feeds=1)
+        cache.get_aggregator("feed", self.gtfs, begin_time="070000", end_time="080000")
+        with mock.patch.object(
+            AggregatorCache, "_unify_stops", side_effect=AssertionError
+        ):
+            aggregator = cache.get_aggregator(
+                "feed", self.gtfs, begin_time="080000", end_time="090000"
+            )
+        self.assertEqual(
+            [f["properties"]["frequency"] for f in aggregator.read_route_frequency()],
+            [1, 1],
+        )
+
+    def test_route_frequency_by_chunks(self):
+        aggregator = AggregatorCache(max_feeds=1).get_aggregator("feed", self.gtfs)
+        with mock.patch("gtfs_go_aggregate.RECORDS_CHUNK_SIZE", 1):
+            features = aggregator.read_route_frequency()
+            self.assertNotIsInstance(features, list)
+            self.assertEqual(
+                list(features), Aggregator(self.gtfs).read_route_frequency()
+            )
+
+    def test_computed_once_by_threads(self):
+        cache = AggregatorCache(max_feeds=1)
+        unify_stops = AggregatorCache._unify_stops
+
+        def slow_unify_stops(*args):
+            time.sleep(0.1)
+            return unify_stops(*args)
+
+        with mock.patch.object(
+            AggregatorCache, "_unify_stops", side_effect=slow_unify_stops
+        ) as mocked:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                futures = [
+                    executor.submit(cache.get_aggregator, "feed", self.gtfs)
+                    for _ in range(4)
+                ]
+                for future in futures:
+                    future.result()
+        self.assertEqual(mocked.call_count, 1)
+
+    def test_max_feeds(self):
+        cache = AggregatorCache(max_feeds=1)
+        cache.get_gtfs("first", lambda: self.gtfs)
+        cache.get_gtfs("second", lambda: self.gtfs)
+        self.assertEqual(list(cache.feeds.keys()), ["second"])
+
+
+class TestCalcNearIdPair(unittest.TestCase):
+    def test_same_as_aggregator(self):
+        rnd = np.random.default_rng(0)
+        stops = pd.DataFrame(
+            {
+                "stop_id": [f"S{i}" for i in rnd.permutation(2000)],
+                "stop_name": [f"Stop {i}" for i in rnd.integers(0, 10, 2000)],
+                "stop_lon": 139 + rnd.random(2000) * 0.05,
+                "stop_lat": 35 + rnd.random(2000) * 0.05,
+            }
+        )
+        stops.loc[0:1, "stop_name"] = np.nan
+        stops.loc[2, "stop_lon"] = np.nan
+
+        expected = Aggregator._Aggregator__calc_near_id_pair(stops, MAX_DISTANCE_DEGREE)
+        pd.testing.assert_frame_equal(
+            calc_near_id_pair(stops, MAX_DISTANCE_DEGREE),
+            expected.reset_index(drop=True),
+            check_dtype=False,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from gtfs_go_aggregate import Aggregator
+from gtfs_go_calendar import MAX_DAYS_AFTER_CHANGES, ServiceCalendar
+from gtfs_go_feed import read_gtfs
+
+from .gtfs_fixture import TABLES, write_gtfs_zip
+
+
+def iter_dates(first: datetime.date, last: datetime.date):
+    for days in range((last - first).days + 1):
+        yield (first + datetime.timedelta(days=days)).strftime("%Y%m%d")
+
+
+class TestServiceCalendar(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def load(self, tables=TABLES, compact=False):
+        path = write_gtfs_zip(os.path.join(self.tempdir.name, "feed.zip"), tables)
+        return read_gtfs(path, compact=compact)
+
+    def assert_same_as_aggregator(self, gtfs):
+        calendar = ServiceCalendar.from_gtfs(gtfs)
+        # days out of the calendar are included
+        for yyyymmdd in iter_dates(
+            datetime.date(2023, 12, 30), datetime.date(2025, 1, 2)
+        ):
+            expected = Aggregator._Aggregator__get_trips_on_a_date(gtfs, yyyymmdd)
+            self.assertEqual(
+                sorted(calendar.get_trips_on(gtfs.trips, yyyymmdd)),
+                sorted(expected),
+                yyyymmdd,
+            )
+
+    def test_same_as_aggregator(self):
+        self.assert_same_as_aggregator(self.load())
+        self.assert_same_as_aggregator(self.load(compact=True))
+
+    def test_without_calendar_dates(self):
+        tables = {k: v for k, v in TABLES.items() if k != "calendar_dates.txt"}
+        self.assert_same_as_aggregator(self.load(tables))
+
+    def test_only_calendar_dates(self):
+        tables = {k: v for k, v in TABLES.items() if k != "calendar.txt"}
+        tables["calendar_dates.txt"] = tables["calendar_dates.txt"] + [
+            "WEEKDAY,20240102,1",
+            "WEEKDAY,20240103,1",
+        ]
+        gtfs = self.load(tables)
+        self.assert_same_as_aggregator(gtfs)
+        calendar = ServiceCalendar.from_gtfs(gtfs)
+        self.assertEqual(calendar.get_dates_of("WEEKDAY"), ["20240102", "20240103"])
+        self.assertEqual(list(calendar.get_services_on("20240101")), ["WEEKEND"])
+
+    def test_open_ended_calendar(self):
+        tables = dict(TABLES)
+        tables["calendar.txt"] = [
+            TABLES["calendar.txt"][0],
+            "WEEKDAY,1,1,1,1,1,0,0,20240101,29991231",
+            "WEEKEND,0,0,0,0,0,1,1,20240101,20241231",
+        ]
+        gtfs = self.load(tables)
+        self.assert_same_as_aggregator(gtfs)
+        calendar = ServiceCalendar.from_gtfs(gtfs)
+        # the bitmap ends a year after the last start_date
+        self.assertLessEqual(calendar.bitmap.shape[1], 366 + MAX_DAYS_AFTER_CHANGES)
+        for yyyymmdd in ("20260105", "29991231", "29991228"):
+            expected = Aggregator._Aggregator__get_trips_on_a_date(gtfs, yyyymmdd)
+            self.assertEqual(
+                sorted(calendar.get_trips_on(gtfs.trips, yyyymmdd)),
+                sorted(expected),
+                yyyymmdd,
+            )
+        self.assertEqual(list(calendar.get_services_on("29991231")), ["WEEKDAY"])
+        self.assertEqual(calendar.get_dates_of("WEEKDAY")[-1], "29991231")
+        self.assertEqual(calendar.get_dates_of("WEEKEND")[-1], "20241229")
+
+    def test_get_dates_of(self):
+        calendar = ServiceCalendar.from_gtfs(self.load())
+        weekend = calendar.get_dates_of("WEEKEND")
+        # 2024 has 52 weekends and 20240101 is added
+        self.assertEqual(len(weekend), 105)
+        self.assertEqual(weekend[:3], ["20240101", "20240106", "20240107"])
+        self.assertNotIn("20240101", calendar.get_dates_of("WEEKDAY"))
+        self.assertEqual(calendar.get_dates_of("UNKNOWN"), [])
+
+    def test_get_services_on(self):
+        calendar = ServiceCalendar.from_gtfs(self.load())
+        self.assertEqual(list(calendar.get_services_on("20240102")), ["WEEKDAY"])
+        self.assertEqual(len(calendar.get_services_on("20250101")), 0)
+        self.assertEqual(len(calendar.get_services_on("")), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
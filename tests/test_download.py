@@ -0,0 +1,208 @@
+import http.server
+import os
+import tempfile
+import threading
+import unittest
+import zipfile
+
+from gtfs_go_download import (
+    DownloadCache,
+    DownloadError,
+    download_zip,
+    get_download_path,
+)
+
+
+class RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+    """serve bytes of the server's payload, supporting Range header"""
+
+    def do_GET(self):
+        self.server.request_count += 1
+        payload = self.server.payload
+        etag = '"' + str(hash(payload)) + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        start = 0
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+        if range_header and (
+            if_range is None or if_range == etag or self.server.ignores_if_range
+        ):
+            start = int(range_header.replace("bytes=", "").split("-")[0])
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {start}-{len(payload) - 1}/{len(payload)}"
+            )
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(payload) - start))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(payload[start:])
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        payload = self.make_zip("stops.txt", "stop_id,stop_name\n" + "s,name\n" * 1000)
+
+        self.server = http.server.HTTPServer(("127.0.0.1", 0), RangeRequestHandler)
+        self.server.payload = payload
+        self.server.request_count = 0
+        self.server.ignores_if_range = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/feed.zip"
+
+    def make_zip(self, filename: str, text: str) -> bytes:
+        zip_path = os.path.join(self.tempdir.name, "source.zip")
+        with zipfile.ZipFile(zip_path, "w") as z:
+            z.writestr(filename, text)
+        with open(zip_path, "rb") as f:
+            return f.read()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tempdir.cleanup()
+
+
+class TestDownload(LocalServerTestCase):
+    def test_download_zip(self):
+        download_path = get_download_path(self.url, self.tempdir.name)
+        progresses = []
+        result = download_zip(
+            self.url,
+            download_path,
+            progress_callback=lambda done, total: progresses.append((done, total)),
+            chunk_size=64,
+        )
+        self.assertEqual(result, download_path)
+        self.assertTrue(zipfile.is_zipfile(download_path))
+        self.assertFalse(os.path.exists(download_path + ".part"))
+        payload_size = len(self.server.payload)
+        self.assertEqual(progresses[-1], (payload_size, payload_size))
+
+    def download_partially(self, download_path: str):
+        progresses = []
+        result = download_zip(
+            self.url,
+            download_path,
+            progress_callback=lambda done, total: progresses.append((done, total)),
+            is_canceled=lambda: len(progresses) >= 2,
+            chunk_size=64,
+        )
+        self.assertIsNone(result)
+        self.assertEqual(os.path.getsize(download_path + ".part"), 128)
+
+    def test_resume(self):
+        download_path = get_download_path(self.url, self.tempdir.name)
+        self.download_partially(download_path)
+
+        progresses = []
+        download_zip(
+            self.url,
+            download_path,
+            progress_callback=lambda done, total: progresses.append((done, total)),
+        )
+        with open(download_path, "rb") as f:
+            self.assertEqual(f.read(), self.server.payload)
+        # only the rest of file is downloaded
+        self.assertEqual(len(progresses), 1)
+        payload_size = len(self.server.payload)
+        self.assertEqual(progresses[0], (payload_size, payload_size))
+        self.assertFalse(os.path.exists(download_path + ".part.json"))
+
+    def test_resume_without_validator(self):
+        download_path = get_download_path(self.url, self.tempdir.name)
+        with open(download_path + ".part", "wb") as f:
+            f.write(b"unknown version")
+        download_zip(self.url, download_path)
+        with open(download_path, "rb") as f:
+            self.assertEqual(f.read(), self.server.payload)
+
+    def test_changed_between_requests(self):
+        for ignores_if_range in (False, True):
+            with self.subTest(ignores_if_range=ignores_if_range):
+                self.server.ignores_if_range = ignores_if_range
+                self.server.payload = self.make_zip(
+                    "stops.txt", "stop_id,stop_name\n" + "s,name\n" * 1000
+                )
+                download_path = get_download_path(self.url, self.tempdir.name)
+                self.download_partially(download_path)
+
+                # same size but different bytes, not detected as a broken zip
+                self.server.payload = self.make_zip(
+                    "stops.txt", "stop_id,stop_name\n" + "t,name\n" * 1000
+                )
+                download_zip(self.url, download_path)
+                with open(download_path, "rb") as f:
+                    self.assertEqual(f.read(), self.server.payload)
+
+    def test_cancel(self):
+        download_path = get_download_path(self.url, self.tempdir.name)
+        result = download_zip(self.url, download_path, is_canceled=lambda: True)
+        self.assertIsNone(result)
+        self.assertFalse(os.path.exists(download_path))
+
+    def test_invalid_zip(self):
+        self.server.payload = b"not a zip file"
+        download_path = get_download_path(self.url, self.tempdir.name)
+        with self.assertRaises(DownloadError):
+            download_zip(self.url, download_path)
+        self.assertFalse(os.path.exists(download_path + ".part"))
+
+
+class TestDownloadCache(LocalServerTestCase):
+    def make_cache(self, max_size=1024**3, max_age=3600):
+        return DownloadCache(
+            os.path.join(self.tempdir.name, "cache"), max_size, max_age
+        )
+
+    def test_cached_by_key(self):
+        cache = self.make_cache()
+        path = cache.fetch(self.url, key="uid-20240101")
+        self.assertTrue(zipfile.is_zipfile(path))
+        self.assertEqual(cache.fetch(self.url, key="uid-20240101"), path)
+        self.assertEqual(self.server.request_count, 1)
+
+        # reloaded from index.json
+        self.assertEqual(self.make_cache().fetch(self.url, key="uid-20240101"), path)
+        self.assertEqual(self.server.request_count, 1)
+
+    def test_revalidate(self):
+        cache = self.make_cache(max_age=0)
+        path = cache.fetch(self.url)
+        self.assertEqual(cache.fetch(self.url), path)
+        # revalidated by conditional GET, responded 304
+        self.assertEqual(self.server.request_count, 2)
+
+        # modified on server
+        self.server.payload = self.make_zip("stops.txt", "stop_id\nmodified\n")
+        new_path = cache.fetch(self.url)
+        self.assertNotEqual(new_path, path)
+        with open(new_path, "rb") as f:
+            self.assertEqual(f.read(), self.server.payload)
+
+    def test_evict(self):
+        cache = self.make_cache(max_size=len(self.server.payload) + 1)
+        first_path = cache.fetch(self.url + "?first")
+        self.server.payload = self.make_zip("stops.txt", "stop_id\nsecond\n")
+        second_path = cache.fetch(self.url + "?second")
+
+        self.assertFalse(os.path.exists(first_path))
+        self.assertTrue(os.path.exists(second_path))
+        self.assertEqual([e["url"] for e in cache.entries()], [self.url + "?second"])
+
+        cache.clear()
+        self.assertEqual(cache.size(), 0)
+        self.assertFalse(os.path.exists(second_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
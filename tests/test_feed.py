@@ -0,0 +1,177 @@
+import os
+import tempfile
+import unittest
+from dataclasses import fields
+
+import pandas as pd
+
+# Tweeked to import gtfs_parser for Python 3.11
+try:
+    from gtfs_parser import gtfs_parser
+except ImportError:
+    # Python 3.9 or 3.10
+    import gtfs_parser
+
+from gtfs_go_aggregate import AggregatorCache
+from gtfs_go_feed import (
+    STOP_TIMES_COLUMNS,
+    evict_snapshots,
+    feather,
+    file_sha256,
+    get_snapshot_name,
+    load_gtfs,
+    read_gtfs,
+    time_to_seconds,
+)
+
+from .gtfs_fixture import TABLES, write_gtfs_zip
+
+
+@unittest.skipIf(feather is None, "pyarrow is not installed")
+class TestFeedSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.zip_path = write_gtfs_zip(os.path.join(self.tempdir.name, "feed.zip"))
+        self.snapshot_dir = os.path.join(self.tempdir.name, "snapshots")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_snapshot_roundtrip(self):
+        gtfs = load_gtfs(self.zip_path, self.snapshot_dir)
+        self.assertEqual(len(os.listdir(self.snapshot_dir)), 1)
+
+        cached = load_gtfs(self.zip_path, self.snapshot_dir)
+        for field in fields(gtfs):
+            expected = getattr(gtfs, field.name)
+            if expected is None:
+                self.assertIsNone(getattr(cached, field.name))
+            else:
+                pd.testing.assert_frame_equal(getattr(cached, field.name), expected)
+
+    def test_stop_times_not_loaded_to_write(self):
+        gtfs = load_gtfs(self.zip_path, self.snapshot_dir)
+        self.assertFalse(gtfs.is_loaded("stop_times"))
+        cached = load_gtfs(self.zip_path, self.snapshot_dir)
+        pd.testing.assert_frame_equal(cached.stop_times, gtfs.stop_times)
+
+    def test_stop_times_with_bom_and_missing_times(self):
+        tables = dict(TABLES)
+        tables["stop_times.txt"] = [
+            "\ufefftrip_id,departure_time,stop_id,stop_sequence,stop_headsign",
+            'T1,07:00:00,S1_1,1,"Terminal, North"',
+            "T1,,S2_A,2,",
+        ]
+        zip_path = write_gtfs_zip(os.path.join(self.tempdir.name, "bom.zip"), tables)
+        gtfs = load_gtfs(zip_path, self.snapshot_dir)
+        cached = load_gtfs(zip_path, self.snapshot_dir)
+        pd.testing.assert_frame_equal(cached.stop_times, gtfs.stop_times)
+        self.assertTrue(pd.isna(cached.stop_times["departure_time"].iloc[1]))
+
+    def test_ragged_stop_times(self):
+        tables = dict(TABLES)
+        tables["stop_times.txt"] = [
+            "trip_id,arrival_time,departure_time,stop_id,stop_sequence,pickup_type",
+            "T1,07:00:00,07:00:00,S1_1,1,0",
+            # trailing empty field is left off
+            "T1,07:10:00,07:10:00,S2_A,2",
+        ]
+        zip_path = write_gtfs_zip(os.path.join(self.tempdir.name, "ragged.zip"), tables)
+        gtfs = load_gtfs(zip_path, self.snapshot_dir)
+        # snapshot is skipped, not to fail loading the feed
+        self.assertEqual(os.listdir(self.snapshot_dir), [])
+
+        expected = gtfs_parser.GTFSFactory(zip_path)
+        pd.testing.assert_frame_equal(
+            gtfs.stop_times, expected.stop_times[list(STOP_TIMES_COLUMNS)]
+        )
+        self.assertEqual(
+            gtfs_parser.parse.read_stops(gtfs),
+            gtfs_parser.parse.read_stops(expected),
+        )
+
+    def test_snapshot_version(self):
+        load_gtfs(self.zip_path, self.snapshot_dir)
+        load_gtfs(self.zip_path, self.snapshot_dir, compact=True)
+        sha256 = file_sha256(self.zip_path)
+        self.assertEqual(
+            sorted(os.listdir(self.snapshot_dir)),
+            [get_snapshot_name(sha256, False), get_snapshot_name(sha256, True)],
+        )
+        # a snapshot of older version is not read
+        old_path = os.path.join(self.snapshot_dir, sha256)
+        os.mkdir(old_path)
+        gtfs = load_gtfs(self.zip_path, self.snapshot_dir)
+        self.assertEqual(len(gtfs.stops), 8)
+
+    def test_evict(self):
+        load_gtfs(self.zip_path, self.snapshot_dir)
+        evict_snapshots(self.snapshot_dir, 0)
+        self.assertEqual(os.listdir(self.snapshot_dir), [])
+
+    def test_without_snapshot_dir(self):
+        gtfs = load_gtfs(self.zip_path)
+        self.assertEqual(len(gtfs.stops), 8)
+        self.assertFalse(os.path.exists(self.snapshot_dir))
+
+
+class TestLazyFeed(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.zip_path = write_gtfs_zip(os.path.join(self.tempdir.name, "feed.zip"))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_stop_times_on_access(self):
+        gtfs = read_gtfs(self.zip_path)
+        expected = gtfs_parser.GTFSFactory(self.zip_path)
+        self.assertEqual(
+            gtfs_parser.parse.read_routes(gtfs),
+            gtfs_parser.parse.read_routes(expected),
+        )
+        self.assertFalse(gtfs.is_loaded("stop_times"))
+
+        self.assertEqual(tuple(gtfs.stop_times.columns), STOP_TIMES_COLUMNS)
+        pd.testing.assert_frame_equal(
+            gtfs.stop_times, expected.stop_times[list(STOP_TIMES_COLUMNS)]
+        )
+        pd.testing.assert_frame_equal(gtfs.routes, expected.routes)
+        self.assertIsNone(gtfs.feed_info)
+
+
+class TestCompactFeed(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.zip_path = write_gtfs_zip(os.path.join(self.tempdir.name, "feed.zip"))
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_time_to_seconds(self):
+        seconds = time_to_seconds(pd.Series(["7:00:00", "25:30:10", None, "7:00:00"]))
+        self.assertEqual(seconds.tolist(), [25200, 91810, -1, 25200])
+        self.assertEqual(seconds.dtype, "int32")
+
+    def test_same_results(self):
+        gtfs = load_gtfs(self.zip_path)
+        compact = load_gtfs(self.zip_path, compact=True)
+        self.assertEqual(compact.stop_times["stop_sequence"].dtype, "int32")
+        self.assertEqual(compact.stop_times["departure_time"].dtype, "category")
+
+        params = {"yyyymmdd": "20240106", "begin_time": "240000", "end_time": "260000"}
+        expected = AggregatorCache(max_feeds=1).get_aggregator("feed", gtfs, **params)
+        aggregator = AggregatorCache(max_feeds=1).get_aggregator(
+            "feed", compact, **params
+        )
+        self.assertEqual(
+            list(aggregator.read_route_frequency()),
+            list(expected.read_route_frequency()),
+        )
+        self.assertEqual(
+            aggregator.read_interpolated_stops(), expected.read_interpolated_stops()
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
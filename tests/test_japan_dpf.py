@@ -0,0 +1,179 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from contextlib import closing
+from unittest import mock
+
+from repository.japan_dpf.api import FeedsClient, ResponseCache, make_files_url
+from repository.japan_dpf.catalogue import Catalogue
+from repository.japan_dpf.table import (
+    HEADERS,
+    SORT_ROLE,
+    FilterProxyModel,
+    Model,
+)
+
+
+def make_file(
+    file_uid, feed_id, from_date, to_date, bbox=None, updated_at="1", org_id="1"
+):
+    feed = {
+        "file_uid": file_uid,
+        "organization_id": org_id,
+        "feed_id": feed_id,
+        "feed_pref_id": 13,
+        "file_from_date": from_date,
+        "file_to_date": to_date,
+        "file_last_updated_at": updated_at,
+    }
+    if bbox is not None:
+        feed.update(
+            zip(("file_min_lon", "file_max_lon", "file_min_lat", "file_max_lat"), bbox)
+        )
+    return feed
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.url = make_files_url("2024-01-02", pref=13)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_make_files_url(self):
+        self.assertTrue(self.url.endswith("/files?target_date=2024-01-02&pref=13"))
+        self.assertTrue(make_files_url(None).endswith("/files?"))
+
+    def test_cache_on_disk(self):
+        ResponseCache(self.tempdir.name, ttl=60).set(self.url, [{"feed_id": "1"}])
+        # read by a new instance, as after restarting QGIS
+        cache = ResponseCache(self.tempdir.name, ttl=60)
+        self.assertEqual(cache.get(self.url), [{"feed_id": "1"}])
+        self.assertIsNone(cache.get(make_files_url("2024-01-03", pref=13)))
+
+    def test_expired(self):
+        cache = ResponseCache(None, ttl=60)
+        cache.set(self.url, [])
+        self.assertEqual(cache.get(self.url), [])
+        with mock.patch("time.time", return_value=time.time() + 120):
+            self.assertIsNone(cache.get(self.url))
+
+
+class TestFeedsClient(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("repository.japan_dpf.api.QgsNetworkAccessManager")
+        nam = patcher.start()
+        self.addCleanup(patcher.stop)
+        nam.instance.return_value.get.side_effect = lambda request: mock.MagicMock()
+        self.client = FeedsClient(ResponseCache(None, ttl=60))
+
+    def test_search_does_not_cancel_sync(self):
+        canceled = mock.Mock()
+        self.client.catalogueCanceled.connect(canceled)
+        self.client.fetch_catalogue()
+        reply = self.client.catalogue_reply
+
+        self.client.search("2024-01-02")
+        self.client.cancel()
+        reply.abort.assert_not_called()
+        self.assertTrue(self.client.is_fetching_catalogue())
+
+        self.client.cancel_catalogue()
+        reply.abort.assert_called_once()
+        canceled.assert_called_once()
+        self.assertFalse(self.client.is_fetching_catalogue())
+
+
+class TestCatalogue(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.catalogue = Catalogue(os.path.join(self.tempdir.name, "catalogue.sqlite"))
+        self.files = [
+            make_file("a1", "A", "2024-01-01", "2024-06-30", (139, 140, 35, 36)),
+            make_file("a2", "A", "2024-04-01", None, (139, 140, 35, 36)),
+            make_file("b1", "B", "2024-01-01", "2024-12-31"),
+        ]
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def search(self, *args, **kwargs):
+        return [f["file_uid"] for f in self.catalogue.search(*args, **kwargs)]
+
+    def test_search(self):
+        self.assertFalse(self.catalogue.is_synced())
+        self.catalogue.sync(self.files)
+        self.assertTrue(self.catalogue.is_synced())
+
+        # latest file of each feed
+        self.assertEqual(self.search("2024-05-01"), ["a2", "b1"])
+        self.assertEqual(self.search("2024-02-01"), ["a1", "b1"])
+        self.assertEqual(self.search("2025-01-01", pref=13), ["a2"])
+        self.assertEqual(self.search("2024-05-01", pref=1), [])
+        # b1 without bounding box is filtered out by extent
+        self.assertEqual(self.search("2024-05-01", extent=(0, 0, 1, 1)), [])
+        self.assertEqual(
+            self.search("2024-05-01", extent=(139.5, 35.5, 141, 37)), ["a2"]
+        )
+
+    def test_has_bbox(self):
+        self.assertFalse(self.catalogue.has_bbox())
+        self.catalogue.sync(self.files[2:])
+        self.assertFalse(self.catalogue.has_bbox())
+        self.catalogue.sync(self.files)
+        self.assertTrue(self.catalogue.has_bbox())
+
+    def test_incremental_sync(self):
+        self.catalogue.sync(self.files)
+        self.files[2]["file_last_updated_at"] = "2"
+        counts = self.catalogue.sync(self.files[1:])
+        self.assertEqual(counts, {"added": 0, "updated": 1, "removed": 1})
+        self.assertEqual(self.search("2024-02-01"), ["b1"])
+
+    def test_same_feed_id_of_organizations(self):
+        self.files.append(make_file("c1", "A", "2024-01-01", None, org_id="2"))
+        self.catalogue.sync(self.files)
+        self.assertEqual(self.search("2024-05-01"), ["a2", "b1", "c1"])
+        self.assertEqual(self.search("2024-02-01"), ["a1", "b1", "c1"])
+
+    def test_rebuilt_on_schema_change(self):
+        self.catalogue.sync(self.files)
+        with closing(sqlite3.connect(self.catalogue.path)) as conn:
+            conn.execute("PRAGMA user_version = 1")
+        self.assertFalse(self.catalogue.is_synced())
+        self.assertEqual(self.catalogue.sync(self.files)["added"], 3)
+
+
+class TestModel(unittest.TestCase):
+    def test_append_and_filter(self):
+        results = [
+            {
+                "organization_name": "Tokyo Bus",
+                "feed_name": "Tokyo",
+                "feed_pref_id": 13,
+            },
+            {"organization_name": "Sapporo", "feed_name": "Bus", "feed_pref_id": 1},
+        ]
+        model = Model(results[:1])
+        model.append(results[1:])
+        self.assertEqual(model.rowCount(None), 2)
+        # results are not modified
+        self.assertNotIn("feed_pref", results[0])
+
+        pref_column = HEADERS.index("pref")
+        self.assertEqual(model.index(1, pref_column).data(), "北海道")
+        self.assertEqual(model.index(1, pref_column).data(SORT_ROLE), 1)
+
+        proxy_model = FilterProxyModel()
+        proxy_model.setSourceModel(model)
+        proxy_model.set_filter_text("BUS")
+        self.assertEqual(proxy_model.rowCount(), 2)
+        proxy_model.set_filter_text("sapporo")
+        self.assertEqual(proxy_model.rowCount(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from gtfs_go_memory import MemoryLayerSource
+
+from .test_writer import FEATURES
+from .utilities import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+
+class TestMemoryLayerSource(unittest.TestCase):
+    def test_from_features(self):
+        source = MemoryLayerSource.from_features(FEATURES[:1])
+        layer = source.make_layer("stops")
+        self.assertTrue(layer.isValid())
+        self.assertEqual(layer.featureCount(), 1)
+
+        feature = next(layer.getFeatures())
+        self.assertEqual(feature["stop_name"], "駅前")
+        self.assertEqual(feature["route_ids"], '["R1"]')
+        self.assertEqual(feature.geometry().asPoint().x(), 139.0)
+
+    def test_from_rows(self):
+        rows = [{"stop_id": "S1", "frequency": 1}, {"stop_id": "S2", "frequency": 2.5}]
+        layer = MemoryLayerSource.from_rows(rows).make_layer("result")
+        self.assertTrue(layer.isValid())
+        self.assertEqual(
+            [feature["frequency"] for feature in layer.getFeatures()], [1.0, 2.5]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+from gtfs_go_palette import RouteColorPalette, parse_route_color
+
+
+class TestRouteColorPalette(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, "route_colors.json")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_parse_route_color(self):
+        self.assertEqual(parse_route_color("ff0000"), "#FF0000")
+        self.assertEqual(parse_route_color("#00FF00"), "#00FF00")
+        self.assertIsNone(parse_route_color(""))
+        self.assertIsNone(parse_route_color("red"))
+        self.assertIsNone(parse_route_color(float("nan")))
+
+    def test_route_color_first(self):
+        palette = RouteColorPalette(self.path)
+        self.assertEqual(palette.get_color("R1", "0000FF"), "#0000FF")
+        self.assertFalse(palette.is_modified)
+
+    def test_stable_colors(self):
+        palette = RouteColorPalette(self.path)
+        colors = [palette.get_color(f"R{i}") for i in range(20)]
+        palette.save()
+
+        # same colors after the palette is changed
+        reloaded = RouteColorPalette(self.path, palette=["black"])
+        self.assertEqual([reloaded.get_color(f"R{i}") for i in range(20)], colors)
+        # same colors without persisted file
+        self.assertEqual(
+            [RouteColorPalette().get_color(f"R{i}") for i in range(20)], colors
+        )
+
+    def test_max_entries(self):
+        palette = RouteColorPalette(self.path, max_entries=2)
+        for route_id in ["R1", "R2", "R3"]:
+            palette.get_color(route_id)
+        self.assertEqual(list(palette.colors.keys()), ["R2", "R3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
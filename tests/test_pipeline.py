@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from gtfs_go_aggregate import Aggregator
+from gtfs_go_feed import load_gtfs
+from gtfs_go_pipeline import FeedProcessor, get_output_names, main
+from gtfs_go_trace import StageTrace
+
+from .gtfs_fixture import write_gtfs_zip
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.feed_path = write_gtfs_zip(os.path.join(self.tempdir.name, "feed.zip"))
+        patcher = mock.patch(
+            "gtfs_go_pipeline.FEED_SNAPSHOT_DIR",
+            os.path.join(self.tempdir.name, "snapshots"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_process(self):
+        output_dir = os.path.join(self.tempdir.name, "output")
+        result = FeedProcessor({"yyyymmdd": "20240102"}).process(
+            self.feed_path, output_dir
+        )
+
+        with open(result["written_files"]["aggregated_routes"], encoding="utf-8") as f:
+            features = json.load(f)["features"]
+        expected = Aggregator(load_gtfs(self.feed_path), yyyymmdd="20240102")
+        self.assertEqual(
+            features, json.loads(json.dumps(expected.read_route_frequency()))
+        )
+        self.assertTrue(os.path.exists(result["written_files"]["aggregated_csv"]))
+        self.assertGreater(len(result["routes"]), 0)
+
+    def test_stop_times_stage(self):
+        trace = StageTrace()
+        FeedProcessor({}, trace=trace).process(
+            self.feed_path, os.path.join(self.tempdir.name, "output")
+        )
+        stages = [record["stage"] for record in trace.records]
+        # read once, before the first stage using it
+        self.assertEqual(stages.count("load stop_times"), 1)
+        self.assertLess(stages.index("load stop_times"), stages.index("parse stops"))
+
+    def test_main(self):
+        output_dir = os.path.join(self.tempdir.name, "output")
+        missing_path = os.path.join(self.tempdir.name, "missing.zip")
+
+        exit_code = main(
+            [
+                self.feed_path,
+                missing_path,
+                "-o",
+                output_dir,
+                "--simple",
+                "--workers",
+                "1",
+            ]
+        )
+        self.assertEqual(exit_code, 1)
+        # no directory for the feed failed to load
+        self.assertEqual(os.listdir(output_dir), ["feed"])
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(output_dir, "feed"))),
+            ["routes.geojson", "stops.geojson"],
+        )
+
+    def test_same_file_names(self):
+        self.assertEqual(
+            get_output_names(
+                ["a/GTFS.zip", "b/GTFS.zip", "feed.2024.zip", "feed.2025.zip", "dir/"]
+            ),
+            ["GTFS", "GTFS_2", "feed.2024", "feed.2025", "dir"],
+        )
+
+        other_dir = os.path.join(self.tempdir.name, "other")
+        os.makedirs(other_dir)
+        other_path = write_gtfs_zip(os.path.join(other_dir, "feed.zip"))
+        output_dir = os.path.join(self.tempdir.name, "output")
+        exit_code = main([self.feed_path, other_path, "-o", output_dir, "--simple"])
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(sorted(os.listdir(output_dir)), ["feed", "feed_2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
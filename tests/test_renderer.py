@@ -0,0 +1,59 @@
+import unittest
+
+from gtfs_go_memory import MemoryLayerSource
+from gtfs_go_renderer import Renderer
+
+from .utilities import get_qgis_app
+
+QGIS_APP, CANVAS, IFACE, PARENT = get_qgis_app()
+
+FEATURES = [
+    {
+        "type": "Feature",
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [[139.0, 35.0], [139.1, 35.1]],
+        },
+        "properties": {"route_name": route_name},
+    }
+    for route_name in ["B", "A", "B"]
+]
+
+
+class TestRenderer(unittest.TestCase):
+    def setUp(self):
+        self.layer = MemoryLayerSource.from_features(FEATURES).make_layer("routes")
+
+    def get_categories(self, renderer: Renderer):
+        return [
+            (category.value(), category.symbol().symbolLayer(1).color().name())
+            for category in renderer.make_renderer().categories()
+        ]
+
+    def test_categories_from_provider(self):
+        categories = self.get_categories(Renderer(self.layer, "route_name"))
+        self.assertEqual([value for value, _ in categories], ["A", "B"])
+        # colors don't change between runs
+        self.assertEqual(
+            categories, self.get_categories(Renderer(self.layer, "route_name"))
+        )
+
+    def test_route_color(self):
+        renderer = Renderer(
+            self.layer, "route_name", {"A": ("R1", "FF0000"), "B": ("R2", None)}
+        )
+        self.assertEqual(self.get_categories(renderer)[0], ("A", "#ff0000"))
+
+    def test_categories_from_values(self):
+        self.assertEqual(
+            self.get_categories(
+                Renderer(
+                    self.layer, "route_name", {"A": (None, None), "B": (None, None)}
+                )
+            ),
+            self.get_categories(Renderer(self.layer, "route_name")),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import json
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+from gtfs_go_trace import StageTrace, format_record
+
+
+class TestStageTrace(unittest.TestCase):
+    def test_measure(self):
+        records = []
+        trace = StageTrace(on_record=records.append)
+        with self.assertRaises(ValueError):
+            with trace.measure("feed", "load"):
+                raise ValueError
+        self.assertEqual(records[0]["stage"], "load")
+        self.assertIsNone(records[0]["traced_peak_mb"])
+
+        tracemalloc.start()
+        try:
+            with trace.measure("feed", "parse"):
+                data = bytearray(4 * 1024**2)
+        finally:
+            tracemalloc.stop()
+        del data
+        self.assertGreaterEqual(records[1]["traced_peak_mb"], 4)
+        self.assertIn("feed: parse", format_record(records[1]))
+
+    def test_write_json(self):
+        trace = StageTrace()
+        with trace.measure("feed", "load"):
+            pass
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = os.path.join(tempdir, "trace.json")
+            trace.write_json(path)
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(json.load(f)["records"][0]["feed"], "feed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from gtfs_go_writer import (
+    OUTPUT_FORMATS,
+    VECTOR_TILE_FORMATS,
+    OgrWriter,
+    add_style_hints,
+    get_available_formats,
+    ogr,
+    write_csv,
+    write_geojson,
+    write_layer,
+    write_table,
+    write_vector_tiles,
+)
+
+FEATURES = [
+    {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [139.0, 35.0]},
+        "properties": {"stop_id": "S1", "stop_name": "駅前", "route_ids": ["R1"]},
+    },
+    {
+        "type": "Feature",
+        "geometry": {
+            "type": "LineString",
+            "coordinates": ([139.0, 35.0], [139.1, 35.1]),
+        },
+        "properties": {"frequency": 3, "prev_stop_name": None},
+    },
+]
+
+
+class TestWriter(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_write_geojson(self):
+        path = os.path.join(self.tempdir.name, "features.geojson")
+        count = write_geojson(path, (feature for feature in FEATURES))
+        self.assertEqual(count, 2)
+
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        self.assertEqual(
+            text,
+            json.dumps(
+                {"type": "FeatureCollection", "features": FEATURES},
+                ensure_ascii=False,
+            ),
+        )
+
+    def test_write_empty_geojson(self):
+        path = os.path.join(self.tempdir.name, "empty.geojson")
+        self.assertEqual(write_geojson(path, []), 0)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["features"], [])
+
+    def test_add_style_hints(self):
+        features = [{"type": "Feature", "geometry": None, "properties": {"count": 4}}]
+        hinted = list(add_style_hints("aggregated_stops", features))
+        self.assertEqual(hinted[0]["properties"], {"count": 4, "symbol_size": 1.2})
+        # original features may be cached, so they are not modified
+        self.assertEqual(features[0]["properties"], {"count": 4})
+        self.assertIs(next(add_style_hints("stops", features)), features[0])
+
+    def test_write_csv(self):
+        path = os.path.join(self.tempdir.name, "result.csv")
+        rows = [
+            {"stop_id": "S1", "similar_stop_id": "S1"},
+            {"stop_id": "S2", "similar_stop_id": "S1"},
+        ]
+        self.assertEqual(write_csv(path, iter(rows)), 2)
+        with open(path, encoding="utf-8", newline="") as f:
+            self.assertEqual(list(csv.DictReader(f)), rows)
+
+
+class TestAvailableFormats(unittest.TestCase):
+    def test_geojson_without_gdal(self):
+        with mock.patch("gtfs_go_writer.ogr", None):
+            self.assertEqual(
+                get_available_formats(OUTPUT_FORMATS + VECTOR_TILE_FORMATS),
+                ("GeoJSON",),
+            )
+
+    def test_without_driver(self):
+        ogr_mock = mock.Mock()
+        # as GDAL older than 3.8
+        ogr_mock.GetDriverByName.side_effect = lambda name: (
+            None if name == "PMTiles" else mock.Mock()
+        )
+        with mock.patch("gtfs_go_writer.ogr", ogr_mock):
+            self.assertEqual(
+                get_available_formats(OUTPUT_FORMATS + VECTOR_TILE_FORMATS),
+                OUTPUT_FORMATS + ("MBTiles",),
+            )
+            with self.assertRaisesRegex(ValueError, "PMTiles"):
+                OgrWriter("gtfs.pmtiles", "PMTiles").write_layers({})
+
+
+@unittest.skipIf(ogr is None, "GDAL is not installed")
+class TestGeoPackage(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_write_layers(self):
+        stops = write_layer(self.tempdir.name, "stops", FEATURES[:1], "GeoPackage")
+        routes = write_layer(self.tempdir.name, "routes", FEATURES[1:], "GeoPackage")
+        result = write_table(
+            self.tempdir.name, "result", [{"stop_id": "S1"}], "GeoPackage"
+        )
+        path = stops.split("|")[0]
+        self.assertEqual(routes.split("|")[0], path)
+        self.assertTrue(result.endswith("|layername=result"))
+
+        datasource = ogr.Open(path)
+        self.assertEqual(datasource.GetLayerCount(), 3)
+        feature = datasource.GetLayerByName("stops").GetNextFeature()
+        self.assertEqual(feature.GetField("stop_name"), "駅前")
+        self.assertEqual(json.loads(feature.GetField("route_ids")), ["R1"])
+        self.assertEqual(feature.GetGeometryRef().GetX(), 139.0)
+
+    def test_overwrite_layer(self):
+        write_layer(self.tempdir.name, "stops", FEATURES[:1] * 2, "GeoPackage")
+        path = write_layer(self.tempdir.name, "stops", FEATURES[:1], "GeoPackage")
+        datasource = ogr.Open(path.split("|")[0])
+        self.assertEqual(datasource.GetLayerByName("stops").GetFeatureCount(), 1)
+
+
+@unittest.skipIf(ogr is None, "GDAL is not installed")
+class TestFlatGeobuf(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_write_layer(self):
+        write_layer(self.tempdir.name, "routes", FEATURES[1:] * 2, "FlatGeobuf")
+        path = write_layer(self.tempdir.name, "routes", FEATURES[1:], "FlatGeobuf")
+        self.assertEqual(path, os.path.join(self.tempdir.name, "routes.fgb"))
+
+        layer = ogr.Open(path).GetLayer(0)
+        self.assertEqual(layer.GetFeatureCount(), 1)
+        layer.SetSpatialFilterRect(139.05, 35.05, 139.2, 35.2)
+        self.assertEqual(layer.GetNextFeature().GetField("frequency"), 3)
+        layer.SetSpatialFilterRect(140.0, 36.0, 141.0, 37.0)
+        self.assertIsNone(layer.GetNextFeature())
+
+
+@unittest.skipIf(ogr is None, "GDAL is not installed")
+class TestVectorTiles(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_write_mbtiles(self):
+        path = write_vector_tiles(
+            self.tempdir.name,
+            {"stops": FEATURES[:1], "routes": FEATURES[1:]},
+            "MBTiles",
+            min_zoom=5,
+            max_zoom=10,
+        )
+        datasource = ogr.Open(path)
+        self.assertEqual(
+            sorted(
+                datasource.GetLayer(i).GetName()
+                for i in range(datasource.GetLayerCount())
+            ),
+            ["routes", "stops"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()